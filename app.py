@@ -7,20 +7,31 @@ Arquivo principal da aplicação.
 
 import streamlit as st
 
-from database.db import criar_tabelas, get_connection, get_placeholder
+from database.db import criar_tabelas
+from database.cardapios import carregar_cardapio_atual, salvar_cardapio
+from database.eventos import iniciar_ouvinte_alteracoes
+from database.repositorio import invalidar_catalogo_usuario, obter_catalogo_usuario
+from core.compacta import SemanaCompacta, compactar_semana
+from core.compras import ListaCompras
+from core.aleatorio import nova_semente
 from core.gerador import (
-    gerar_cardapio,
+    criar_estado_semana,
+    gerar_cardapio_cacheado,
     regenerar_almoco,
     regenerar_lanche,
     regenerar_jantar,
 )
+from core.familia import gerar_cardapios_casa
+from core.planejador import CardapioInviavel
+from core.porcoes import ajustar_semana
 from ui.login import tela_login
 from ui.painel_alimentos import painel_alimentos
 from ui.botoes import render_botoes
-from ui.visualizacao import mostrar_cardapio, mostrar_lista_individual
+from ui.visualizacao import mostrar_cardapio, mostrar_lista_familia, mostrar_lista_individual
 
 
 criar_tabelas()
+iniciar_ouvinte_alteracoes()
 
 st.set_page_config(page_title="Gerador de Cardápio", layout="wide")
 
@@ -44,33 +55,17 @@ else:
 usuario_id = int(usuario_id)
 st.session_state.usuario_id = usuario_id
 
+# Cache do processo; o painel invalida a entrada a cada escrita.
+dados_usuario = obter_catalogo_usuario(usuario_id)
 
-def listar_moradores(usuario_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    placeholder = get_placeholder()
-
-    cursor.execute(
-        f"""
-        SELECT id, nome, meta_calorica
-        FROM moradores
-        WHERE usuario_id = {placeholder}
-        """,
-        (usuario_id,),
-    )
-
-    dados = cursor.fetchall()
-    conn.close()
-    return dados
-
-
-moradores = listar_moradores(usuario_id)
-
-if not moradores:
+if not dados_usuario.moradores:
     from database.db import onboarding_inicial
 
     onboarding_inicial(usuario_id)
-    moradores = listar_moradores(usuario_id)
+    invalidar_catalogo_usuario(usuario_id)
+    dados_usuario = obter_catalogo_usuario(usuario_id)
+
+moradores = dados_usuario.moradores
 
 st.title("Gerador de Cardápio")
 
@@ -82,17 +77,38 @@ with col1:
 
 with col2:
     modo_admin = st.toggle("Modo administrador")
+    modo_casa = st.toggle("Casa inteira", help="Gera a semana de todos os moradores de uma vez.")
 
 if modo_admin:
-    painel_alimentos(usuario_id)
+    painel_alimentos(usuario_id, dados_usuario)
     st.stop()
 
-nomes_moradores = [m[1] for m in moradores]
+if modo_casa:
+    catalogos = {m.id: dados_usuario.catalogo_morador(m.id) for m in moradores}
+
+    if "sementes_casa" not in st.session_state:
+        st.session_state.sementes_casa = {}
+    if st.button("Gerar novas semanas"):
+        st.session_state.sementes_casa = {m.id: nova_semente() for m in moradores}
+    sementes = {m.id: st.session_state.sementes_casa.get(m.id, m.id) for m in moradores}
+
+    semanas_casa, erros_casa = gerar_cardapios_casa(catalogos, sementes)
+
+    for m in moradores:
+        if m.id in erros_casa:
+            st.error(f"{m.nome}: {erros_casa[m.id]}")
+        else:
+            mostrar_cardapio(semanas_casa[m.id], m.nome, m.meta_calorica)
+
+    mostrar_lista_familia(list(semanas_casa.values()))
+    st.stop()
+
+nomes_moradores = [m.nome for m in moradores]
 morador_nome = st.selectbox("Selecionar morador", nomes_moradores)
 
-morador_data = next(m for m in moradores if m[1] == morador_nome)
-morador_id = morador_data[0]
-meta_padrao = int(morador_data[2])
+morador_data = next(m for m in moradores if m.nome == morador_nome)
+morador_id = morador_data.id
+meta_padrao = morador_data.meta_calorica
 
 meta_key = f"meta_diaria_{morador_id}"
 if meta_key not in st.session_state:
@@ -105,95 +121,109 @@ meta_diaria = st.number_input(
     key=meta_key,
 )
 
+ajustar_meta = st.checkbox(
+    "Ajustar porções à meta",
+    key=f"ajustar_meta_{morador_id}",
+    help="Aumenta ou reduz as porcoes (dentro de limites) para cada dia fechar a meta diaria.",
+)
 
-def carregar_alimentos(usuario_id, morador_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    placeholder = get_placeholder()
-
-    cursor.execute(
-        f"""
-        SELECT a.id, a.nome, a.preco, p.gramas
-        FROM alimentos a
-        LEFT JOIN porcoes p
-            ON p.alimento_id = a.id
-           AND p.morador_id = {placeholder}
-        WHERE a.usuario_id = {placeholder}
-        """,
-        (morador_id, usuario_id),
-    )
-    dados = cursor.fetchall()
-
-    cursor.execute(
-        f"""
-        SELECT pa.alimento_id, pa.nome
-        FROM preparos_alimento pa
-        JOIN alimentos a ON a.id = pa.alimento_id
-        WHERE a.usuario_id = {placeholder}
-        ORDER BY pa.nome
-        """,
-        (usuario_id,),
-    )
-    preparos_raw = cursor.fetchall()
-    conn.close()
-
-    preparos_por_alimento = {}
-    for alimento_id, preparo_nome in preparos_raw:
-        preparos_por_alimento.setdefault(alimento_id, []).append(preparo_nome)
-
-    alimentos = []
-    for alimento_id, nome, preco, gramas in dados:
-        alimentos.append(
-            {
-                "id": alimento_id,
-                "nome": nome,
-                "preco": preco,
-                "preparos": preparos_por_alimento.get(alimento_id, []),
-                "gramas": gramas,
-            }
-        )
-
-    return alimentos
-
+modo_economico = st.checkbox(
+    "Modo econômico",
+    key=f"modo_economico_{morador_id}",
+    help="Monta a semana mais barata que respeita as regras do cardapio.",
+)
 
-alimentos = carregar_alimentos(usuario_id, morador_id)
-if not alimentos:
+if not dados_usuario.alimentos:
     st.warning("Nenhum alimento cadastrado.")
     st.stop()
 
 if "semana" not in st.session_state:
     st.session_state.semana = None
 
-assinatura_alimentos = tuple(
-    sorted(
-        (
-            a["id"],
-            a["nome"],
-            float(a["preco"]),
-            a.get("gramas"),
-            tuple(sorted(a.get("preparos", []))),
-        )
-        for a in alimentos
-    )
-)
+catalogo = dados_usuario.catalogo_morador(morador_id)
 
 if st.session_state.get("morador_cardapio_id") != morador_id:
     st.session_state.semana = None
+    # Semana salva do morador; sem ela, semente padrao reproduzivel entre sessoes.
+    salvo = carregar_cardapio_atual(morador_id)
+    st.session_state.cardapio_salvo = salvo
+    st.session_state.semente_semana = salvo.semente if salvo else morador_id
+    st.session_state.numero_semana = salvo.numero if salvo else 0
     st.session_state.morador_cardapio_id = morador_id
-    st.session_state.alimentos_assinatura = assinatura_alimentos
-elif st.session_state.get("alimentos_assinatura") != assinatura_alimentos:
+    st.session_state.catalogo_versao = catalogo.versao
+elif st.session_state.get("catalogo_versao") != catalogo.versao:
     st.session_state.semana = None
-    st.session_state.alimentos_assinatura = assinatura_alimentos
+    st.session_state.catalogo_versao = catalogo.versao
 
-
-def gerar_semana():
-    return gerar_cardapio(morador_id, alimentos)
+if st.session_state.get("modo_economico_cardapio") != modo_economico:
+    st.session_state.semana = None
+    st.session_state.modo_economico_cardapio = modo_economico
+
+
+def gerar_semana(semente=None, numero=None):
+    # Semente e numero novos so entram na sessao se a semana sair.
+    if semente is None:
+        semente = st.session_state.semente_semana
+    try:
+        semana = gerar_cardapio_cacheado(
+            morador_id,
+            catalogo,
+            semente,
+            economico=modo_economico,
+        )
+    except CardapioInviavel as erro:
+        st.error(f"Nao foi possivel gerar o cardapio: {erro}")
+        st.stop()
+
+    st.session_state.semente_semana = semente
+    if numero is not None:
+        st.session_state.numero_semana = numero
+    st.session_state.semana = compactar_semana(semana)
+    st.session_state.estado_semana = criar_estado_semana(semana, catalogo)
+    st.session_state.lista_semana = ListaCompras.de_dias(semana)
+    salvar_semana()
+    return semana
+
+
+def restaurar_semana(salvo):
+    st.session_state.semana = SemanaCompacta.decodificar(salvo.dados)
+    semana = st.session_state.semana.expandir(catalogo)
+    st.session_state.estado_semana = criar_estado_semana(semana, catalogo)
+    st.session_state.lista_semana = ListaCompras.de_dias(semana)
+    return semana
+
+
+def salvar_semana():
+    salvar_cardapio(
+        morador_id,
+        st.session_state.numero_semana,
+        st.session_state.semente_semana,
+        modo_economico,
+        catalogo.versao,
+        st.session_state.semana.codificar(),
+    )
 
 
+# A sessao guarda a semana compacta; o formato em dicionarios so existe no rerun.
 if st.session_state.semana is None:
-    st.session_state.semana = gerar_semana()
+    salvo = st.session_state.pop("cardapio_salvo", None)
+    # A semana salva so vale para o mesmo catalogo e o mesmo modo.
+    if salvo and salvo.assinatura == catalogo.versao and salvo.economico == modo_economico:
+        try:
+            semana = restaurar_semana(salvo)
+        except ValueError:
+            # Blob corrompido ou de formato antigo: a semente refaz a mesma semana.
+            semana = gerar_semana(semente=salvo.semente)
+    else:
+        semana = gerar_semana()
+else:
+    semana = st.session_state.semana.expandir(catalogo)
+    if st.session_state.get("estado_semana") is None:
+        st.session_state.estado_semana = criar_estado_semana(semana, catalogo)
+    if st.session_state.get("lista_semana") is None:
+        st.session_state.lista_semana = ListaCompras.de_dias(semana)
 
-dia_opcoes = [d["Dia"] for d in st.session_state.semana]
+dia_opcoes = [d["Dia"] for d in semana]
 
 if "dia_para_troca" not in st.session_state:
     st.session_state.dia_para_troca = dia_opcoes[0]
@@ -205,15 +235,32 @@ dia_index = dia_opcoes.index(dia_selecionado)
 
 acao = render_botoes()
 
-if acao == "nova":
-    st.session_state.semana = gerar_semana()
-elif acao == "almoco":
-    st.session_state.semana = regenerar_almoco(st.session_state.semana, dia_index, alimentos)
-elif acao == "lanche":
-    st.session_state.semana = regenerar_lanche(st.session_state.semana, dia_index)
-elif acao == "jantar":
-    st.session_state.semana = regenerar_jantar(st.session_state.semana, dia_index, alimentos)
-
-if st.session_state.semana:
-    mostrar_cardapio(st.session_state.semana, morador_nome, meta_diaria)
-    mostrar_lista_individual(st.session_state.semana, morador_nome)
+estado = st.session_state.estado_semana
+lista = st.session_state.lista_semana
+
+try:
+    if acao == "nova":
+        semana = gerar_semana(semente=nova_semente(), numero=st.session_state.numero_semana + 1)
+    elif acao == "almoco":
+        semana = regenerar_almoco(semana, dia_index, catalogo, estado, lista=lista)
+    elif acao == "lanche":
+        semana = regenerar_lanche(semana, dia_index, estado, catalogo=catalogo, lista=lista)
+    elif acao == "jantar":
+        semana = regenerar_jantar(semana, dia_index, catalogo, estado, lista=lista)
+except CardapioInviavel as erro:
+    st.warning(f"Troca nao realizada: {erro}")
+
+if acao in ("almoco", "lanche", "jantar"):
+    st.session_state.semana = compactar_semana(semana)
+    salvar_semana()
+
+if semana:
+    semana_exibida = semana
+    lista_exibida = st.session_state.lista_semana
+    if ajustar_meta:
+        # Porcoes ajustadas mudam as quantidades; a lista e recalculada.
+        semana_exibida = ajustar_semana(semana_exibida, meta_diaria)
+        lista_exibida = None
+
+    mostrar_cardapio(semana_exibida, morador_nome, meta_diaria)
+    mostrar_lista_individual(semana_exibida, morador_nome, lista_exibida)
@@ -17,6 +17,21 @@ import os
 DATABASE_URL = os.getenv("DATABASE_URL")
 DATABASE_PATH = "database/alimentos.db"
 
+# Pool de conexoes (por processo).
+POOL_TAMANHO_MAXIMO = int(os.getenv("POOL_TAMANHO_MAXIMO", "10"))
+POOL_TEMPO_LIMITE = 5.0
+POOL_VERIFICAR_APOS = 30.0
+
+# Catalogo em cache: segundos ate conferir versao_catalogo no banco.
+CATALOGO_VERIFICAR_APOS = float(os.getenv("CATALOGO_VERIFICAR_APOS", "2"))
+
+# Ouvinte de eventos_alteracao: intervalo entre consultas (segundos).
+EVENTOS_INTERVALO = float(os.getenv("EVENTOS_INTERVALO", "1"))
+# Segundos esperando um id pulado aparecer (transacao ainda aberta).
+EVENTOS_ESPERA_LACUNA = float(os.getenv("EVENTOS_ESPERA_LACUNA", "60"))
+# Eventos mais velhos que isso (segundos) sao apagados.
+EVENTOS_RETENCAO = float(os.getenv("EVENTOS_RETENCAO", str(7 * 24 * 3600)))
+
 # =========================================================
 # LIMITES DE CARBO
 # =========================================================
@@ -62,6 +77,23 @@ LEGUMES = ["Pepino", "Tomate", "Cenoura"]
 # =========================================================
 
 PRECO_OVO = 1.30
+PRECO_RAP10 = 3.50
+
+# =========================================================
+# OVOS
+# =========================================================
+
+OVOS_POR_REFEICAO = 3
+GRAMAS_OVOS = 150
+
+# =========================================================
+# AJUSTE DE PORCOES
+# =========================================================
+
+# Fator minimo e maximo aplicado a cada porcao ao buscar a meta diaria.
+PORCAO_FATOR_MIN = 0.7
+PORCAO_FATOR_MAX = 1.3
+PORCAO_PASSO_GRAMAS = 5
 
 # =========================================================
 # METAS DIARIAS
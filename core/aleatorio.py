@@ -0,0 +1,22 @@
+"""
+core/aleatorio.py
+-------------------------------------------------------
+Fonte de aleatoriedade do gerador.
+Aceita um random.Random, uma semente inteira ou None
+(usa o modulo random global).
+-------------------------------------------------------
+"""
+
+import random
+
+
+def obter_rng(rng=None):
+    if rng is None:
+        return random
+    if isinstance(rng, int):
+        return random.Random(rng)
+    return rng
+
+
+def nova_semente():
+    return random.SystemRandom().randrange(2**32)
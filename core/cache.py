@@ -0,0 +1,61 @@
+"""
+core/cache.py
+-------------------------------------------------------
+Cache LRU limitado e seguro entre threads.
+Compartilhado entre as sessoes do Streamlit do mesmo
+processo.
+-------------------------------------------------------
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class CacheLRU:
+    def __init__(self, tamanho_maximo=128):
+        self.tamanho_maximo = tamanho_maximo
+        self.acertos = 0
+        self.falhas = 0
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._itens)
+
+    def __contains__(self, chave):
+        return chave in self._itens
+
+    def obter(self, chave, padrao=None):
+        with self._lock:
+            if chave not in self._itens:
+                self.falhas += 1
+                return padrao
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return self._itens[chave]
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = valor
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho_maximo:
+                self._itens.popitem(last=False)
+        return valor
+
+    def obter_ou_criar(self, chave, fabrica):
+        sentinela = object()
+        valor = self.obter(chave, sentinela)
+        if valor is sentinela:
+            # Fabrica roda fora do lock; corrida so gera trabalho repetido.
+            valor = self.guardar(chave, fabrica())
+        return valor
+
+    def remover(self, chave):
+        with self._lock:
+            self._itens.pop(chave, None)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self.acertos = 0
+            self.falhas = 0
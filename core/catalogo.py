@@ -0,0 +1,199 @@
+"""
+core/catalogo.py
+-------------------------------------------------------
+Catalogo de alimentos compilado por morador.
+Classifica os itens uma unica vez por assinatura e
+guarda as listas prontas usadas pelo gerador, junto
+com a tabela de lanches do usuario.
+-------------------------------------------------------
+"""
+
+import hashlib
+
+from config import LEGUMES
+from core.cache import CacheLRU
+from core.classificacao import chave_nome, classificar
+from core.lanches import tabela_lanches
+from core.regras import compilar_regras, indices_mascara
+
+# Tipos usados pelo gerador, em ordem.
+TIPOS_PROTEINA = ("Frango", "Hamburguer")
+TIPOS_CARBO = ("Batata", "Macarrao", "Mandioca")
+
+# Peso de cada proteina no sorteio de cada horario.
+PESOS_PROTEINA = {"Frango": 3, "Hamburguer": 2, "Ovos": 2}
+
+_cache_catalogos = CacheLRU(tamanho_maximo=64)
+
+
+class ItemCatalogo:
+    __slots__ = ("id", "nome", "preco", "gramas", "preparos", "tipo", "categoria")
+
+    def __init__(self, alimento_id, nome, preco, gramas, preparos, tipo=None, categoria=None):
+        self.id = alimento_id
+        self.nome = nome
+        self.preco = preco
+        self.gramas = gramas
+        self.preparos = tuple(preparos)
+        self.tipo = tipo
+        self.categoria = categoria
+
+    @property
+    def habilitado(self):
+        return self.gramas > 0
+
+    def como_dict(self):
+        return {
+            "id": self.id,
+            "nome": self.nome,
+            "preco": self.preco,
+            "gramas": self.gramas,
+            "preparos": list(self.preparos),
+        }
+
+
+class CatalogoCompilado:
+    __slots__ = (
+        "assinatura",
+        "versao",
+        "itens",
+        "por_id",
+        "por_chave",
+        "por_tipo",
+        "proteinas",
+        "carbos",
+        "legumes",
+        "regras",
+        "carbos_por_mascara",
+        "carbos_por_proteina",
+        "opcoes_proteina",
+        "lanches",
+    )
+
+    def __init__(self, itens, assinatura=None, lanches=None):
+        self.assinatura = assinatura
+        # Identificador estavel entre processos (hash() do Python nao e).
+        self.versao = hashlib.sha1(repr(assinatura).encode()).hexdigest()[:16]
+        self.itens = {item.nome: item for item in itens}
+        self.por_id = {item.id: item for item in itens}
+
+        # Indice pelo nome sem acento e pelo tipo; o item cujo nome e
+        # o proprio tipo tem preferencia sobre variacoes (ex.: Frango Desfiado).
+        self.por_chave = {}
+        self.por_tipo = {}
+        for item in itens:
+            chave = chave_nome(item.nome)
+            self.por_chave.setdefault(chave, item)
+            if not item.tipo:
+                continue
+            atual = self.por_tipo.get(item.tipo)
+            exato = chave == chave_nome(item.tipo)
+            if atual is None or (exato and chave_nome(atual.nome) != chave):
+                self.por_tipo[item.tipo] = item
+
+        self.proteinas = {
+            tipo: self.por_tipo[tipo]
+            for tipo in TIPOS_PROTEINA
+            if tipo in self.por_tipo and self.por_tipo[tipo].habilitado
+        }
+        self.carbos = [
+            self.por_tipo[tipo]
+            for tipo in TIPOS_CARBO
+            if tipo in self.por_tipo and self.por_tipo[tipo].habilitado
+        ]
+        self.legumes = []
+        for nome in LEGUMES:
+            item = self.buscar(nome)
+            if item and item.habilitado:
+                self.legumes.append(item)
+
+        self.regras = compilar_regras(
+            tuple(self.proteinas) + ("Ovos",),
+            tuple(c.tipo for c in self.carbos),
+        )
+        self.carbos_por_mascara = [
+            [self.carbos[j] for j in indices_mascara(mascara)]
+            for mascara in range(self.regras.todos + 1)
+        ]
+        self.carbos_por_proteina = {
+            tipo: self.carbos_por_mascara[mascara]
+            for tipo, mascara in self.regras.mascaras.items()
+        }
+
+        self.opcoes_proteina = []
+        for tipo in TIPOS_PROTEINA:
+            if tipo in self.proteinas:
+                self.opcoes_proteina.extend([tipo] * PESOS_PROTEINA[tipo])
+        # Ovos sempre disponiveis
+        self.opcoes_proteina.extend(["Ovos"] * PESOS_PROTEINA["Ovos"])
+
+        self.lanches = lanches or tabela_lanches()
+
+    def buscar(self, nome):
+        return self.itens.get(nome) or self.por_chave.get(chave_nome(nome))
+
+    def proteina(self, tipo):
+        return self.proteinas.get(tipo)
+
+
+def _normalizar_item(item):
+    if isinstance(item, dict):
+        nome = item["nome"]
+        # None = sem configuracao por morador, usa padrao.
+        # 0 = restricao (nao consumir).
+        gramas_custom = item.get("gramas")
+        classe = classificar(nome)
+        gramas = classe.gramas if gramas_custom is None else int(gramas_custom)
+        return ItemCatalogo(
+            item["id"], nome, item["preco"], gramas, item.get("preparos", []), classe.tipo, classe.categoria
+        )
+
+    alimento_id, nome, preco = item
+    classe = classificar(nome)
+    return ItemCatalogo(alimento_id, nome, preco, classe.gramas, [], classe.tipo, classe.categoria)
+
+
+def normalizar_lanches(lanches):
+    # So entram lanches sorteaveis; sem nenhum, vale a tabela padrao.
+    validos = tuple(
+        (nome, int(gramas), tipo, float(peso))
+        for nome, gramas, tipo, peso in lanches or ()
+        if float(peso) > 0 and int(gramas) > 0
+    )
+    return validos or None
+
+
+def assinatura_catalogo(alimentos, lanches=None):
+    assinatura = tuple(
+        sorted(
+            (
+                a["id"],
+                a["nome"],
+                float(a["preco"]),
+                a.get("gramas"),
+                tuple(sorted(a.get("preparos", []))),
+            )
+            if isinstance(a, dict)
+            else (a[0], a[1], float(a[2]), None, ())
+            for a in alimentos
+        )
+    )
+    lanches = normalizar_lanches(lanches)
+    if lanches:
+        # Lanches do usuario fazem parte do catalogo (e da sua versao).
+        assinatura += (("lanches", lanches),)
+    return assinatura
+
+
+def compilar_catalogo(alimentos, assinatura=None, lanches=None):
+    if assinatura is None:
+        assinatura = assinatura_catalogo(alimentos, lanches)
+
+    return _cache_catalogos.obter_ou_criar(
+        assinatura,
+        lambda: CatalogoCompilado(
+            [_normalizar_item(a) for a in alimentos],
+            assinatura,
+            tabela_lanches(normalizar_lanches(lanches)),
+        ),
+    )
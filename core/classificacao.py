@@ -0,0 +1,72 @@
+"""
+core/classificacao.py
+-------------------------------------------------------
+Classificacao de alimentos pelo nome.
+
+Os nomes sao comparados sem acento e sem maiusculas
+(Hambúrguer == Hamburguer == hamburguer). Cada nome e
+classificado uma unica vez; as consultas seguintes
+sao um acesso a dicionario.
+-------------------------------------------------------
+"""
+
+import unicodedata
+from functools import lru_cache
+
+# (trechos do nome, tipo, categoria, gramas padrao), em ordem de prioridade.
+# Todos os trechos precisam aparecer no nome ja sem acento.
+REGRAS_CLASSIFICACAO = (
+    (("rap10",), "Rap10", "lanche", 100),
+    (("vitamina",), "Vitamina", "lanche", 300),
+    (("pasta de amendoim",), "Pao com Pasta de Amendoim", "lanche", 230),
+    (("presunto", "mussarela"), "Sanduiche", "lanche", 180),
+    (("banana", "aveia"), "Banana com Aveia", "lanche", 220),
+    (("frango",), "Frango", "proteina", 150),
+    (("hamb",), "Hamburguer", "proteina", 120),
+    (("macarr",), "Macarrao", "carbo", 140),
+    (("mandioca",), "Mandioca", "carbo", 180),
+    (("batata",), "Batata", "carbo", 180),
+    (("pepino",), "Pepino", "legume", 80),
+    (("tomate",), "Tomate", "legume", 80),
+    (("cenoura",), "Cenoura", "legume", 80),
+)
+
+GRAMAS_OUTROS = 100
+
+# Rap10 com dois recheios e mais pesado.
+GRAMAS_RAP10_DUPLO = 140
+
+
+class Classificacao:
+    __slots__ = ("chave", "tipo", "categoria", "gramas")
+
+    def __init__(self, chave, tipo, categoria, gramas):
+        self.chave = chave
+        self.tipo = tipo
+        self.categoria = categoria
+        self.gramas = gramas
+
+    def __repr__(self):
+        return f"Classificacao({self.chave!r}, {self.tipo!r}, {self.categoria!r}, {self.gramas})"
+
+
+def chave_nome(nome):
+    decomposto = unicodedata.normalize("NFKD", nome or "")
+    sem_acento = "".join(c for c in decomposto if not unicodedata.combining(c))
+    return " ".join(sem_acento.casefold().split())
+
+
+@lru_cache(maxsize=2048)
+def classificar(nome):
+    chave = chave_nome(nome)
+    for trechos, tipo, categoria, gramas in REGRAS_CLASSIFICACAO:
+        if all(t in chave for t in trechos):
+            if tipo == "Rap10" and chave.count("+") >= 2:
+                gramas = GRAMAS_RAP10_DUPLO
+            return Classificacao(chave, tipo, categoria, gramas)
+    return Classificacao(chave, None, "outro", GRAMAS_OUTROS)
+
+
+def tipo_na_categoria(nome, categoria):
+    classe = classificar(nome)
+    return classe.tipo if classe.categoria == categoria else None
@@ -0,0 +1,212 @@
+"""
+core/compacta.py
+-------------------------------------------------------
+Formato compacto da semana para guardar na sessao.
+
+Cada dia vira uma linha de inteiros num array:
+    dia, lanche, almoco (9 campos), jantar (9 campos)
+Alimentos ficam pelo id do catalogo; nomes de dia,
+lanches e preparos viram codigos numa tabela de textos
+compartilhada pelo processo (cada texto existe uma vez).
+Os textos formatados da refeicao sao refeitos ao
+expandir. Os codigos de texto valem so no processo
+atual; para persistir, codificar() leva junto a
+tabela dos textos usados e comprime tudo (zlib).
+-------------------------------------------------------
+"""
+
+import json
+import sys
+import threading
+import zlib
+from array import array
+
+from core.gerador import KEY_ALMOCO
+from core.preparos import formatar_refeicao
+
+CAMPOS_REFEICAO = (
+    "proteina",
+    "carbo",
+    "legume",
+    "preparo_proteina",
+    "preparo_carbo",
+    "gramas_proteina",
+    "gramas_carbo",
+    "gramas_legume",
+    "ovos",
+)
+CAMPOS_DIA = 2 + 2 * len(CAMPOS_REFEICAO)
+SEM_VALOR = -1
+FORMATO_CODIFICADO = 1
+
+# Posicoes (dentro do dia) que guardam codigos de texto.
+_CAMPOS_TEXTO = (0, 1) + tuple(
+    inicio + CAMPOS_REFEICAO.index(campo)
+    for inicio in (2, 2 + len(CAMPOS_REFEICAO))
+    for campo in ("preparo_proteina", "preparo_carbo")
+)
+
+_textos = []
+_codigos_texto = {}
+_trava_textos = threading.Lock()
+
+
+def codigo_texto(texto):
+    if texto is None:
+        return SEM_VALOR
+    codigo = _codigos_texto.get(texto)
+    if codigo is None:
+        with _trava_textos:
+            codigo = _codigos_texto.get(texto)
+            if codigo is None:
+                codigo = len(_textos)
+                _textos.append(sys.intern(texto))
+                _codigos_texto[texto] = codigo
+    return codigo
+
+
+def texto_codigo(codigo):
+    return None if codigo == SEM_VALOR else _textos[codigo]
+
+
+def _gramas(item):
+    return item.get("g") or item.get("gramas") or 0
+
+
+def _compactar_refeicao(ref):
+    proteina = ref["proteina"]
+    carbo = ref["carbo"]
+    legume = ref.get("legume")
+
+    if proteina.get("tipo") == "ovos":
+        proteina_id, ovos = SEM_VALOR, proteina["quantidade"]
+    else:
+        proteina_id, ovos = proteina["id"], 0
+
+    return (
+        proteina_id,
+        carbo["id"],
+        legume["id"] if legume else SEM_VALOR,
+        codigo_texto(ref.get("preparo_proteina")),
+        codigo_texto(ref.get("preparo_carbo")),
+        _gramas(proteina),
+        _gramas(carbo),
+        _gramas(legume) if legume else 0,
+        ovos,
+    )
+
+
+def _componente(catalogo, alimento_id, gramas):
+    item = catalogo.por_id.get(alimento_id)
+    if item is None:
+        raise KeyError(f"Alimento {alimento_id} nao existe mais no catalogo deste morador.")
+    dados = item.como_dict()
+    dados["gramas"] = gramas
+    return dados
+
+
+def _expandir_refeicao(valores, catalogo):
+    (
+        proteina_id,
+        carbo_id,
+        legume_id,
+        preparo_proteina,
+        preparo_carbo,
+        gramas_proteina,
+        gramas_carbo,
+        gramas_legume,
+        ovos,
+    ) = valores
+
+    if proteina_id == SEM_VALOR:
+        proteina = {"tipo": "ovos", "quantidade": ovos, "gramas": gramas_proteina}
+    else:
+        proteina = _componente(catalogo, proteina_id, gramas_proteina)
+
+    refeicao = {"proteina": proteina, "carbo": _componente(catalogo, carbo_id, gramas_carbo)}
+    if legume_id != SEM_VALOR:
+        refeicao["legume"] = _componente(catalogo, legume_id, gramas_legume)
+    if preparo_proteina != SEM_VALOR:
+        refeicao["preparo_proteina"] = texto_codigo(preparo_proteina)
+    if preparo_carbo != SEM_VALOR:
+        refeicao["preparo_carbo"] = texto_codigo(preparo_carbo)
+
+    return formatar_refeicao(refeicao)
+
+
+class SemanaCompacta:
+    __slots__ = ("codigos",)
+
+    def __init__(self, codigos):
+        self.codigos = codigos
+
+    def __len__(self):
+        return len(self.codigos) // CAMPOS_DIA
+
+    @property
+    def nbytes(self):
+        return self.codigos.itemsize * len(self.codigos)
+
+    def dias(self):
+        return [texto_codigo(self.codigos[i * CAMPOS_DIA]) for i in range(len(self))]
+
+    def codificar(self):
+        # Codigos de texto trocados por posicoes numa tabela local.
+        textos = []
+        locais = {}
+        codigos = list(self.codigos)
+        for i in range(len(codigos)):
+            if i % CAMPOS_DIA not in _CAMPOS_TEXTO or codigos[i] == SEM_VALOR:
+                continue
+            local = locais.get(codigos[i])
+            if local is None:
+                local = locais[codigos[i]] = len(textos)
+                textos.append(texto_codigo(codigos[i]))
+            codigos[i] = local
+        dados = {"formato": FORMATO_CODIFICADO, "textos": textos, "codigos": codigos}
+        return zlib.compress(json.dumps(dados, separators=(",", ":")).encode(), 9)
+
+    @classmethod
+    def decodificar(cls, dados):
+        # Qualquer defeito no blob sai como ValueError para quem chama.
+        try:
+            dados = json.loads(zlib.decompress(bytes(dados)))
+        except zlib.error as erro:
+            raise ValueError(f"Semana codificada corrompida: {erro}") from erro
+        if not isinstance(dados, dict) or dados.get("formato") != FORMATO_CODIFICADO:
+            formato = dados.get("formato") if isinstance(dados, dict) else None
+            raise ValueError(f"Formato de semana desconhecido: {formato}.")
+        try:
+            globais = [codigo_texto(t) for t in dados["textos"]]
+            codigos = array("i", dados["codigos"])
+        except (KeyError, TypeError) as erro:
+            raise ValueError(f"Semana codificada incompleta: {erro}") from erro
+        for i in range(len(codigos)):
+            if i % CAMPOS_DIA in _CAMPOS_TEXTO and codigos[i] != SEM_VALOR:
+                codigos[i] = globais[codigos[i]]
+        return cls(codigos)
+
+    def expandir(self, catalogo):
+        semana = []
+        campos = len(CAMPOS_REFEICAO)
+        for i in range(len(self)):
+            linha = self.codigos[i * CAMPOS_DIA:(i + 1) * CAMPOS_DIA]
+            semana.append(
+                {
+                    "Dia": texto_codigo(linha[0]),
+                    KEY_ALMOCO: _expandir_refeicao(linha[2:2 + campos], catalogo),
+                    "Lanche": catalogo.lanches.montar_por_nome(texto_codigo(linha[1])),
+                    "Jantar": _expandir_refeicao(linha[2 + campos:], catalogo),
+                }
+            )
+        return semana
+
+
+def compactar_semana(semana):
+    codigos = array("i")
+    for d in semana:
+        codigos.append(codigo_texto(d["Dia"]))
+        codigos.append(codigo_texto(d["Lanche"]["nome"]))
+        codigos.extend(_compactar_refeicao(d[KEY_ALMOCO]))
+        codigos.extend(_compactar_refeicao(d["Jantar"]))
+    return SemanaCompacta(codigos)
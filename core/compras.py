@@ -1,107 +1,171 @@
+"""
+core/compras.py
+-------------------------------------------------------
+Lista de compras.
+
+Os cardapios sao achatados numa tabela longa, uma
+linha por componente (alimento, unidade, quantidade
+em g ou un, preco por kg ou por un). A lista sai de
+uma unica reducao agrupada sobre essa tabela, igual
+para uma semana, a casa inteira ou um lote simulado.
+-------------------------------------------------------
+"""
+
+import numpy as np
 import pandas as pd
-from config import PRECO_OVO
+
+from config import PRECO_OVO, PRECO_RAP10
+
+COLUNAS_COMPONENTES = ["Alimento", "Unidade", "Quantidade", "Preco"]
 
 
 def calcular_lista_compras(semana):
+    return reduzir_componentes(tabela_componentes(semana))
+
+
+def calcular_lista_familia(semanas):
+    return reduzir_componentes(tabela_componentes(d for semana in semanas if semana for d in semana))
 
-    totais = {}
-    ovos_total = 0
-    rap10_total = 0
-    custo_total = 0
 
-    for d in semana:
+def calcular_lista_periodo(dias):
+    # Aceita qualquer iteravel de dias (ex.: gerar_dias), consumido uma vez.
+    return reduzir_componentes(tabela_componentes(dias))
 
-        for refeicao_nome in ["Almoço", "Jantar"]:
 
-            ref = d[refeicao_nome]
+def calcular_lista_lote(lote):
+    return reduzir_componentes(tabela_componentes_lote(lote))
 
-            # ---------------- PROTEÍNA ----------------
-            proteina = ref["proteina"]
 
-            if isinstance(proteina, dict) and proteina.get("tipo") == "ovos":
-                ovos_total += proteina["quantidade"]
+def _gramas(item):
+    return item.get("g") or item.get("gramas", 0)
 
-            else:
-                nome = proteina["nome"]
-                gramas = proteina.get("g") or proteina.get("gramas", 0)
-                preco_kg = proteina.get("preco", 0)
 
-                totais.setdefault(nome, {
-                    "gramas": 0,
-                    "preco_kg": preco_kg
-                })
+def componentes_refeicao(ref):
+    proteina = ref["proteina"]
+    if isinstance(proteina, dict) and proteina.get("tipo") == "ovos":
+        yield "Ovos", "un", proteina["quantidade"], PRECO_OVO
+    else:
+        yield proteina["nome"], "kg", _gramas(proteina), proteina.get("preco", 0)
 
-                totais[nome]["gramas"] += gramas
+    carbo = ref["carbo"]
+    yield carbo["nome"], "kg", _gramas(carbo), carbo.get("preco", 0)
 
-            # ---------------- CARBO ----------------
-            carbo = ref["carbo"]
+    if "legume" in ref:
+        legume = ref["legume"]
+        yield legume["nome"], "kg", _gramas(legume), legume.get("preco", 0)
 
-            nome = carbo["nome"]
-            gramas = carbo.get("g") or carbo.get("gramas", 0)
-            preco_kg = carbo.get("preco", 0)
 
-            totais.setdefault(nome, {
-                "gramas": 0,
-                "preco_kg": preco_kg
-            })
+def componentes_lanche(lanche):
+    if lanche.get("tipo") == "rap10":
+        yield "Rap10", "un", 1, PRECO_RAP10
 
-            totais[nome]["gramas"] += gramas
 
-            # ---------------- LEGUME ----------------
-            if "legume" in ref:
-                leg = ref["legume"]
+def componentes_dia(d):
+    yield from componentes_refeicao(d["Almoço"])
+    yield from componentes_refeicao(d["Jantar"])
+    yield from componentes_lanche(d["Lanche"])
 
-                nome = leg["nome"]
-                gramas = leg.get("g") or leg.get("gramas", 0)
-                preco_kg = leg.get("preco", 0)
 
-                totais.setdefault(nome, {
-                    "gramas": 0,
-                    "preco_kg": preco_kg
-                })
+def tabela_componentes(dias):
+    linhas = [linha for d in dias for linha in componentes_dia(d)]
+    return pd.DataFrame(linhas, columns=COLUNAS_COMPONENTES)
 
-                totais[nome]["gramas"] += gramas
 
-        # ---------------- LANCHE ----------------
-        if d["Lanche"].get("tipo") == "rap10":
-            rap10_total += 1
+def tabela_componentes_lote(lote):
+    # Uma linha por alimento com o total do lote inteiro.
+    colunas, consumo = lote.consumo_semanal()
+    totais = consumo.sum(axis=0, dtype=np.float64)
+    itens = lote.catalogo.itens
+    precos = {"Ovos": PRECO_OVO, "Rap10": PRECO_RAP10}
 
-    lista = []
+    linhas = []
+    for (nome, unidade), total in zip(colunas, totais):
+        quantidade = total * 1000 if unidade == "kg" else total
+        preco = float(itens[nome].preco) if unidade == "kg" else precos[nome]
+        linhas.append((nome, unidade, quantidade, preco))
+    return pd.DataFrame(linhas, columns=COLUNAS_COMPONENTES)
 
-    for nome, dados_item in totais.items():
 
-        kg = dados_item["gramas"] / 1000
-        custo = kg * dados_item["preco_kg"]
-        custo_total += custo
+def reduzir_componentes(tabela):
+    if tabela.empty:
+        return pd.DataFrame(), 0
 
-        lista.append({
-            "Alimento": nome,
-            "Quantidade": round(kg, 2),
-            "Unidade": "kg",
-            "Custo estimado (R$)": round(custo, 2)
-        })
+    codigo_alimento, alimentos = pd.factorize(tabela["Alimento"])
+    codigo_unidade, unidades = pd.factorize(tabela["Unidade"])
+    chave = codigo_alimento * len(unidades) + codigo_unidade
+    _, primeira, grupo = np.unique(chave, return_index=True, return_inverse=True)
 
-    if ovos_total:
-        custo_ovos = ovos_total * PRECO_OVO
-        custo_total += custo_ovos
+    soma = np.bincount(grupo, weights=tabela["Quantidade"].to_numpy(dtype=float))
+    preco = tabela["Preco"].to_numpy(dtype=float)[primeira]
+    nome = alimentos.to_numpy()[codigo_alimento[primeira]]
+    unidade = unidades.to_numpy()[codigo_unidade[primeira]]
 
-        lista.append({
-            "Alimento": "Ovos",
-            "Quantidade": ovos_total,
-            "Unidade": "un",
-            "Custo estimado (R$)": round(custo_ovos, 2)
-        })
+    em_kg = unidade == "kg"
+    quantidade = np.where(em_kg, soma / 1000, soma)
+    custo = quantidade * preco
 
-    if rap10_total:
-        preco_un = 3.50
-        custo_rap = rap10_total * preco_un
-        custo_total += custo_rap
+    # Itens a granel primeiro, na ordem em que aparecem; depois ovos e Rap10.
+    ordem = np.where(em_kg, 0, np.where(nome == "Ovos", 1, 2))
+    posicoes = np.lexsort((primeira, ordem))
 
-        lista.append({
-            "Alimento": "Rap10",
-            "Quantidade": rap10_total,
-            "Unidade": "un",
-            "Custo estimado (R$)": round(custo_rap, 2)
-        })
+    # Ovos e Rap10 sao contados: inteiros, nao "9.0" (a soma sai em float).
+    quantidades = [
+        round(float(q), 2) if kg else int(round(float(q)))
+        for q, kg in zip(quantidade[posicoes], em_kg[posicoes])
+    ]
+    lista = pd.DataFrame(
+        {
+            "Alimento": nome[posicoes],
+            "Quantidade": pd.Series(quantidades, dtype=object),
+            "Unidade": unidade[posicoes],
+            "Custo estimado (R$)": [round(float(c), 2) for c in custo[posicoes]],
+        }
+    )
+    return lista, round(float(custo.sum()), 2)
 
-    return pd.DataFrame(lista), round(custo_total, 2)
\ No newline at end of file
+
+class ListaCompras:
+    # Totais mantidos por diferenca: trocar uma refeicao subtrai os
+    # componentes antigos e soma os novos; o DataFrame so sai em calcular().
+    # Itens novos entram no fim da lista, entao a ordem das linhas pode
+    # diferir de um recalculo completo (os valores nao).
+    __slots__ = ("totais",)
+
+    def __init__(self):
+        # (alimento, unidade) -> [quantidade, preco]
+        self.totais = {}
+
+    @classmethod
+    def de_dias(cls, dias):
+        lista = cls()
+        for d in dias:
+            lista._aplicar(componentes_dia(d), 1)
+        return lista
+
+    def _aplicar(self, componentes, sinal):
+        for nome, unidade, quantidade, preco in componentes:
+            chave = (nome, unidade)
+            total = self.totais.get(chave)
+            if total is None:
+                self.totais[chave] = [sinal * quantidade, preco]
+                continue
+            total[0] += sinal * quantidade
+            if not total[0]:
+                del self.totais[chave]
+
+    def trocar_refeicao(self, antiga, nova):
+        self._aplicar(componentes_refeicao(antiga), -1)
+        self._aplicar(componentes_refeicao(nova), 1)
+
+    def trocar_lanche(self, antigo, novo):
+        self._aplicar(componentes_lanche(antigo), -1)
+        self._aplicar(componentes_lanche(novo), 1)
+
+    def tabela(self):
+        return pd.DataFrame(
+            [(nome, unidade, quantidade, preco) for (nome, unidade), (quantidade, preco) in self.totais.items()],
+            columns=COLUNAS_COMPONENTES,
+        )
+
+    def calcular(self):
+        return reduzir_componentes(self.tabela())
@@ -0,0 +1,122 @@
+"""
+core/economico.py
+-------------------------------------------------------
+Modo economico: semana mais barata que respeita as
+mesmas regras do gerador (limites de carbo, regras de
+combinacao e sem refeicoes iguais em sequencia).
+
+Programacao dinamica sobre (refeicao anterior, uso de
+carbos). Estados acima de um limite de carbo, ou que
+nao tem mais limite para completar a semana, sao
+descartados: o que sobra e a semana valida mais
+barata, ou CardapioInviavel se nao houver nenhuma. Como o uso de carbos soma o numero de
+refeicoes ja feitas, cada camada tem poucas dezenas de
+estados e a semana sai em milissegundos.
+-------------------------------------------------------
+"""
+
+from config import OVOS_POR_REFEICAO, PRECO_OVO
+from core.aleatorio import obter_rng
+from core.planejador import (
+    CardapioInviavel,
+    carbos_permitidos,
+    contador_inicial_carbo,
+    diagnosticar,
+    id_refeicao,
+)
+from core.regras import obter_limite_carbo
+
+# Diferenca de custo abaixo disso conta como empate.
+TOLERANCIA = 1e-9
+
+
+def custo_porcao(item):
+    return item.gramas / 1000 * float(item.preco)
+
+
+def indice_preco_porcao(catalogo):
+    indice = {"Ovos": OVOS_POR_REFEICAO * PRECO_OVO}
+    for tipo, item in catalogo.proteinas.items():
+        indice[tipo] = custo_porcao(item)
+    for item in catalogo.carbos + catalogo.legumes:
+        indice[item.nome] = custo_porcao(item)
+    return indice
+
+
+def legumes_mais_baratos(catalogo):
+    if not catalogo.legumes:
+        return []
+    custos = [custo_porcao(item) for item in catalogo.legumes]
+    menor = min(custos)
+    return [item for item, custo in zip(catalogo.legumes, custos) if custo - menor <= TOLERANCIA]
+
+
+def _uso_valido(uso, tipos_carbo, limites, presentes, restantes):
+    livres = 0
+    for tipo, usado, limite in zip(tipos_carbo, uso, limites):
+        if usado > limite:
+            return False
+        if tipo in presentes:
+            livres += limite - usado
+    return livres >= restantes
+
+
+def planejar_refeicoes_economicas(catalogo, total_refeicoes=14, rng=None, anterior=None):
+    rng = obter_rng(rng)
+    motivo = diagnosticar(catalogo, total_refeicoes)
+    if motivo:
+        raise CardapioInviavel(motivo)
+
+    precos = indice_preco_porcao(catalogo)
+    tipos = list(dict.fromkeys(catalogo.opcoes_proteina))
+    tipos_carbo = list(contador_inicial_carbo())
+    limites = [obter_limite_carbo(tipo) for tipo in tipos_carbo]
+    # Capacidade dos carbos do catalogo; os demais tipos nunca sao usados.
+    presentes = {carbo.tipo for carbo in catalogo.carbos}
+
+    # Estado: (id da refeicao anterior, uso de carbos como tupla).
+    inicial = (anterior, tuple(0 for _ in tipos_carbo))
+    camadas = [{inicial: (0.0, [])}]
+
+    for indice in range(total_refeicoes):
+        restantes = total_refeicoes - indice - 1
+        proxima = {}
+        for estado, (custo_atual, _) in camadas[-1].items():
+            anterior, uso = estado
+            contador = dict(zip(tipos_carbo, uso))
+            for tipo in tipos:
+                for carbo in carbos_permitidos(catalogo, tipo, contador):
+                    atual = id_refeicao(tipo, carbo)
+                    if atual == anterior:
+                        continue
+
+                    novo_uso = list(uso)
+                    if carbo.tipo in contador:
+                        novo_uso[tipos_carbo.index(carbo.tipo)] += 1
+                    # Estados acima de um limite, ou sem limite para o resto da semana, saem.
+                    if not _uso_valido(novo_uso, tipos_carbo, limites, presentes, restantes):
+                        continue
+                    destino = (atual, tuple(novo_uso))
+                    custo = custo_atual + precos[tipo] + precos[carbo.nome]
+
+                    melhor = proxima.get(destino)
+                    if melhor is None or custo < melhor[0] - TOLERANCIA:
+                        proxima[destino] = (custo, [(estado, tipo, carbo)])
+                    elif custo - melhor[0] <= TOLERANCIA:
+                        melhor[1].append((estado, tipo, carbo))
+        if not proxima:
+            raise CardapioInviavel("Nenhuma combinacao de refeicoes atende os limites de carbo da semana.")
+        camadas.append(proxima)
+
+    # Reconstrucao sorteando entre os caminhos de custo minimo.
+    final = camadas[-1]
+    menor = min(custo for custo, _ in final.values())
+    estado = rng.choice([e for e, (custo, _) in final.items() if custo - menor <= TOLERANCIA])
+
+    plano = []
+    for camada in reversed(camadas[1:]):
+        anterior, tipo, carbo = rng.choice(camada[estado][1])
+        plano.append((tipo, carbo))
+        estado = anterior
+    plano.reverse()
+    return plano
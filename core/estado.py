@@ -0,0 +1,65 @@
+"""
+core/estado.py
+-------------------------------------------------------
+Estado incremental da semana gerada.
+Guarda contadores de carbo, uso de proteinas, Rap10 e
+as refeicoes em ordem (almoco, jantar, almoco, ...)
+para que a troca de uma refeicao seja O(1), sem
+recontar a semana.
+-------------------------------------------------------
+"""
+
+from collections import Counter
+
+from core.planejador import contador_inicial_carbo
+
+
+class EstadoSemana:
+    __slots__ = ("contador_carbo", "proteinas", "rap10_count", "refeicoes")
+
+    def __init__(self, total_refeicoes=14):
+        self.contador_carbo = contador_inicial_carbo()
+        self.proteinas = Counter()
+        self.rap10_count = 0
+        # (tipo_proteina, tipo_carbo, nome_carbo) por posicao.
+        self.refeicoes = [None] * total_refeicoes
+
+    def id_refeicao(self, posicao):
+        if posicao < 0 or posicao >= len(self.refeicoes) or not self.refeicoes[posicao]:
+            return None
+        tipo_proteina, _tipo_carbo, nome_carbo = self.refeicoes[posicao]
+        return (tipo_proteina, nome_carbo)
+
+    def vizinhos(self, posicao):
+        return {
+            id_atual
+            for id_atual in (self.id_refeicao(posicao - 1), self.id_refeicao(posicao + 1))
+            if id_atual
+        }
+
+    def registrar(self, posicao, tipo_proteina, carbo):
+        self.repor(posicao, (tipo_proteina, carbo.tipo, carbo.nome))
+
+    def remover(self, posicao):
+        atual = self.refeicoes[posicao]
+        if not atual:
+            return None
+        tipo_proteina, tipo_carbo, _nome_carbo = atual
+        self.proteinas[tipo_proteina] -= 1
+        if tipo_carbo in self.contador_carbo:
+            self.contador_carbo[tipo_carbo] -= 1
+        self.refeicoes[posicao] = None
+        return atual
+
+    def repor(self, posicao, refeicao):
+        self.remover(posicao)
+        if not refeicao:
+            return
+        tipo_proteina, tipo_carbo, _nome_carbo = refeicao
+        self.refeicoes[posicao] = refeicao
+        self.proteinas[tipo_proteina] += 1
+        if tipo_carbo in self.contador_carbo:
+            self.contador_carbo[tipo_carbo] += 1
+
+    def trocar_lanche(self, era_rap10, e_rap10):
+        self.rap10_count += int(e_rap10) - int(era_rap10)
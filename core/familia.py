@@ -0,0 +1,29 @@
+"""
+core/familia.py
+-------------------------------------------------------
+Geracao das semanas de todos os moradores da casa.
+A busca e so CPU: threads nao aceleram nada por causa
+do GIL, entao os moradores sao gerados em sequencia.
+As semanas vem do cache por (morador, semente, versao
+do catalogo), e um rerun so refaz quem mudou.
+-------------------------------------------------------
+"""
+
+from core.gerador import gerar_cardapio_cacheado
+from core.planejador import CardapioInviavel
+
+
+def gerar_cardapios_casa(catalogos, sementes, economico=False):
+    semanas = {}
+    erros = {}
+    for morador_id, catalogo in catalogos.items():
+        try:
+            semanas[morador_id] = gerar_cardapio_cacheado(
+                morador_id,
+                catalogo,
+                sementes[morador_id],
+                economico,
+            )
+        except CardapioInviavel as erro:
+            erros[morador_id] = str(erro)
+    return semanas, erros
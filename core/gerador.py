@@ -8,24 +8,23 @@ Gerador de cardapio compativel com:
 -------------------------------------------------------
 """
 
+import copy
 import random
 
-from config import LEGUMES, LIMITES_CARBO
+from config import GRAMAS_OVOS, OVOS_POR_REFEICAO
+from core.aleatorio import obter_rng
+from core.cache import CacheLRU
+from core.economico import legumes_mais_baratos, planejar_refeicoes_economicas
+from core.estado import EstadoSemana
+from core.lanches import tabela_lanches
+from core.planejador import escolher_refeicao, id_refeicao, planejar_refeicoes
 from core.preparos import aplicar_preparo
-from core.regras import aplicar_regras_inteligentes
 
 KEY_ALMOCO = "Almo\u00e7o"
+DIAS_SEMANA = ["Seg", "Ter", "Qua", "Qui", "Sex", "Sab", "Dom"]
+LIMITE_RAP10 = 3
 
-GRAMAS_PADRAO = {
-    "Frango": 150,
-    "Hamburguer": 120,
-    "Macarrao": 140,
-    "Mandioca": 180,
-    "Batata": 180,
-    "Pepino": 80,
-    "Tomate": 80,
-    "Cenoura": 80,
-}
+_cache_semanas = CacheLRU(tamanho_maximo=256)
 
 
 def extrair_id_refeicao(ref):
@@ -34,285 +33,149 @@ def extrair_id_refeicao(ref):
     return (proteina_nome, carbo_nome)
 
 
-def inferir_gramas_padrao(nome):
-    if "Frango" in nome:
-        return GRAMAS_PADRAO["Frango"]
-    if "Hamb" in nome:
-        return GRAMAS_PADRAO["Hamburguer"]
-    if "Macarr" in nome:
-        return GRAMAS_PADRAO["Macarrao"]
-    if "Mandioca" in nome:
-        return GRAMAS_PADRAO["Mandioca"]
-    if "Batata" in nome:
-        return GRAMAS_PADRAO["Batata"]
-    if "Pepino" in nome:
-        return GRAMAS_PADRAO["Pepino"]
-    if "Tomate" in nome:
-        return GRAMAS_PADRAO["Tomate"]
-    if "Cenoura" in nome:
-        return GRAMAS_PADRAO["Cenoura"]
-    return 100
-
-
-def organizar_alimentos_por_nome(alimentos):
-    resultado = {}
-    for item in alimentos:
-        if isinstance(item, dict):
-            alimento_id = item["id"]
-            nome = item["nome"]
-            preco = item["preco"]
-            preparos = item.get("preparos", [])
-            # None = sem configuracao por morador, usa padrao.
-            # 0 = restricao (nao consumir).
-            gramas_custom = item.get("gramas")
-            gramas = inferir_gramas_padrao(nome) if gramas_custom is None else int(gramas_custom)
-        else:
-            alimento_id, nome, preco = item
-            preparos = []
-            gramas = inferir_gramas_padrao(nome)
-
-        resultado[nome] = {
-            "id": alimento_id,
-            "nome": nome,
-            "preco": preco,
-            "gramas": gramas,
-            "preparos": preparos,
-        }
-    return resultado
-
-
-def identificar_tipo_carbo(nome_carbo):
-    if "Macarr" in nome_carbo:
-        return "Macarrao"
-    if "Mandioca" in nome_carbo:
-        return "Mandioca"
-    if "Batata" in nome_carbo:
-        return "Batata"
-    return nome_carbo
-
-
-def obter_limite_carbo(tipo_carbo):
-    if tipo_carbo == "Macarrao":
-        return LIMITES_CARBO.get("Macarrao", LIMITES_CARBO.get("Macarr\u00e3o", 999))
-    return LIMITES_CARBO.get(tipo_carbo, 999)
-
-
-def alimento_habilitado(item):
-    return int(item.get("gramas", 0)) > 0
-
-
-def encontrar_alimento_por_nome(alimentos_dict, nome_base):
-    if nome_base in alimentos_dict:
-        return alimentos_dict[nome_base]
-
-    if nome_base == "Hamburguer":
-        for candidato in ("Hamb\u00farguer", "Hamburguer"):
-            if candidato in alimentos_dict:
-                return alimentos_dict[candidato]
-
-    if nome_base == "Macarrao":
-        for candidato in ("Macarr\u00e3o", "Macarrao"):
-            if candidato in alimentos_dict:
-                return alimentos_dict[candidato]
-
-    return None
-
-
-def _carbos_disponiveis(alimentos_dict):
-    candidatos = ["Batata", "Macarr\u00e3o", "Mandioca"]
-    validos = []
-    for nome in candidatos:
-        item = encontrar_alimento_por_nome(alimentos_dict, nome)
-        if item and alimento_habilitado(item):
-            validos.append(nome)
-    return validos
-
-
-def gerar_refeicao_fixa(tipo_proteina, incluir_legume, contador_carbo, alimentos_dict):
+def sortear_legume(catalogo, rng=None):
+    if not catalogo.legumes:
+        return None
+    return obter_rng(rng).choice(catalogo.legumes)
+
+
+def montar_refeicao(tipo_proteina, carbo, legume, catalogo, rng=None):
     if tipo_proteina == "Ovos":
-        proteina = {"tipo": "ovos", "quantidade": 3, "gramas": 150}
+        proteina = {"tipo": "ovos", "quantidade": OVOS_POR_REFEICAO, "gramas": GRAMAS_OVOS}
     else:
-        proteina = encontrar_alimento_por_nome(alimentos_dict, tipo_proteina)
-        if not proteina or not alimento_habilitado(proteina):
+        item_proteina = catalogo.proteina(tipo_proteina)
+        if not item_proteina:
             raise KeyError(f"Proteina '{tipo_proteina}' nao disponivel para este morador.")
+        proteina = item_proteina.como_dict()
 
-    carbos_base = _carbos_disponiveis(alimentos_dict)
-    if not carbos_base:
-        raise ValueError("Nenhum carbo disponivel para este morador.")
-
-    carbos = aplicar_regras_inteligentes(proteina, carbos_base)
-    carbos_filtrados = []
-
-    for carbo_nome in carbos:
-        tipo_carbo = identificar_tipo_carbo(carbo_nome)
-        if contador_carbo[tipo_carbo] < obter_limite_carbo(tipo_carbo):
-            carbos_filtrados.append(carbo_nome)
-
-    if not carbos_filtrados:
-        carbos_filtrados = carbos
-
-    carbo_nome = random.choice(carbos_filtrados)
-    carbo = encontrar_alimento_por_nome(alimentos_dict, carbo_nome)
-    if not carbo or not alimento_habilitado(carbo):
-        raise KeyError(f"Carbo '{carbo_nome}' nao disponivel para este morador.")
-
-    contador_carbo[identificar_tipo_carbo(carbo_nome)] += 1
-    refeicao = {"proteina": proteina, "carbo": carbo}
-
-    if incluir_legume:
-        legumes_disponiveis = [
-            nome for nome in LEGUMES
-            if (nome in alimentos_dict and alimento_habilitado(alimentos_dict[nome]))
-        ]
-        if legumes_disponiveis:
-            legume_nome = random.choice(legumes_disponiveis)
-            refeicao["legume"] = alimentos_dict[legume_nome]
-
-    return aplicar_preparo(refeicao)
-
-
-def gerar_lanche(rap10_count, limite_rap10):
-    opcoes = [
-        "Banana + Aveia",
-        "Sanduiche Presunto + Mussarela",
-        "Pao + Banana + Pasta de Amendoim",
-        "Vitamina de Banana + Aveia",
-    ]
-    pesos = [3, 2, 2, 2]
-
-    if rap10_count < limite_rap10:
-        recheios = random.sample(["Frango Desfiado", "Presunto", "Queijo"], k=random.choice([1, 2]))
-        opcoes.append("Rap10 + " + " + ".join(recheios))
-        pesos.append(1)
-
-    escolhido = random.choices(opcoes, weights=pesos, k=1)[0]
-
-    if escolhido.startswith("Rap10"):
-        gramas = 140 if escolhido.count("+") >= 2 else 100
-    elif "Vitamina" in escolhido:
-        gramas = 300
-    elif "Presunto" in escolhido and "Mussarela" in escolhido:
-        gramas = 180
-    elif "Pasta de Amendoim" in escolhido:
-        gramas = 230
-    else:
-        gramas = 220
-
-    return {
-        "tipo": "rap10" if escolhido.startswith("Rap10") else "simples",
-        "nome": escolhido,
-        "gramas": gramas,
-    }
-
-
-def _contador_inicial_carbo():
-    return {"Macarrao": 0, "Mandioca": 0, "Batata": 0}
-
-
-def _opcoes_proteina(alimentos_dict):
-    opcoes = []
-    frango = encontrar_alimento_por_nome(alimentos_dict, "Frango")
-    if frango and alimento_habilitado(frango):
-        opcoes.extend(["Frango"] * 3)
+    refeicao = {"proteina": proteina, "carbo": carbo.como_dict()}
 
-    hamburguer = encontrar_alimento_por_nome(alimentos_dict, "Hamburguer")
-    if hamburguer and alimento_habilitado(hamburguer):
-        opcoes.extend(["Hamburguer"] * 2)
+    if legume:
+        refeicao["legume"] = legume.como_dict()
 
-    # Ovos sempre disponiveis
-    opcoes.extend(["Ovos"] * 2)
-    return opcoes
+    return aplicar_preparo(refeicao, rng)
 
 
-def _montar_pool_semanal(alimentos_dict, total_refeicoes=14):
-    opcoes = _opcoes_proteina(alimentos_dict)
-    if not opcoes:
-        return []
-    return [random.choice(opcoes) for _ in range(total_refeicoes)]
+def gerar_lanche(rap10_count, limite_rap10, rng=None, tabela=None):
+    rng = obter_rng(rng)
+    tabela = tabela or tabela_lanches()
+    return tabela.montar(tabela.sortear(rng, permitir_rap10=rap10_count < limite_rap10))
 
 
-def _escolher_proteina_almoco(proteinas_semana):
-    if "Ovos" in proteinas_semana:
-        return random.choice(proteinas_semana + ["Ovos", "Ovos"])
-    return random.choice(proteinas_semana)
+def gerar_dias(catalogo, semanas=None, rng=None, economico=False):
+    # Gera os dias em sequencia, planejando uma semana por vez.
+    # semanas=None segue indefinidamente (ex.: ciclos mensais com islice).
+    rng = obter_rng(rng)
+    total_refeicoes = 2 * len(DIAS_SEMANA)
 
+    if economico:
+        planejar = planejar_refeicoes_economicas
+        legumes = legumes_mais_baratos(catalogo)
+        # Lanches simples nao entram no custo; o Rap10 entra.
+        limite_rap10 = 0
+    else:
+        planejar = planejar_refeicoes
+        legumes = catalogo.legumes
+        limite_rap10 = LIMITE_RAP10
 
-def gerar_cardapio(morador_id, alimentos):
-    dias = ["Seg", "Ter", "Qua", "Qui", "Sex", "Sab", "Dom"]
-    semana = []
-    rap10_count = 0
-
-    alimentos_dict = organizar_alimentos_por_nome(alimentos)
-    proteinas_semana = _montar_pool_semanal(alimentos_dict, total_refeicoes=14)
-    if len(proteinas_semana) < 14:
-        raise ValueError("Proteinas insuficientes para gerar a semana desse morador.")
-
-    random.shuffle(proteinas_semana)
-    contador_carbo = _contador_inicial_carbo()
-    incluir_legume = True
-    ultima_refeicao_id = None
+    anterior = None
+    numero = 0
+    while semanas is None or numero < semanas:
+        # Limites de carbo, contagem de proteinas e Rap10 zeram a cada semana;
+        # so a ultima refeicao passa adiante, para nao repetir na virada.
+        plano = planejar(catalogo, total_refeicoes=total_refeicoes, rng=rng, anterior=anterior)
+        rap10_count = 0
 
-    for dia in dias:
-        while True:
-            if not proteinas_semana:
-                raise ValueError("Proteinas insuficientes.")
+        for indice, dia in enumerate(DIAS_SEMANA):
+            legume = rng.choice(legumes) if legumes else None
+            almoco = montar_refeicao(*plano[2 * indice], legume, catalogo, rng)
 
-            tipo_proteina = _escolher_proteina_almoco(proteinas_semana)
-            almoco = gerar_refeicao_fixa(tipo_proteina, incluir_legume, contador_carbo, alimentos_dict)
-            id_atual = extrair_id_refeicao(almoco)
+            lanche = gerar_lanche(rap10_count, limite_rap10=limite_rap10, rng=rng, tabela=catalogo.lanches)
+            if lanche["tipo"] == "rap10":
+                rap10_count += 1
 
-            if id_atual != ultima_refeicao_id:
-                proteinas_semana.remove(tipo_proteina)
-                break
+            legume = rng.choice(legumes) if legumes else None
+            jantar = montar_refeicao(*plano[2 * indice + 1], legume, catalogo, rng)
+            yield {"Dia": dia, KEY_ALMOCO: almoco, "Lanche": lanche, "Jantar": jantar}
 
-        ultima_refeicao_id = id_atual
-        lanche = gerar_lanche(rap10_count, limite_rap10=3)
-        if lanche["tipo"] == "rap10":
-            rap10_count += 1
+        anterior = id_refeicao(*plano[-1])
+        numero += 1
 
-        ultima_refeicao_id = ("lanche", lanche["nome"])
 
-        while True:
-            if not proteinas_semana:
-                raise ValueError("Proteinas insuficientes.")
+def gerar_cardapio(morador_id, catalogo, rng=None, economico=False):
+    return list(gerar_dias(catalogo, semanas=1, rng=rng, economico=economico))
 
-            tipo_proteina = random.choice(proteinas_semana)
-            jantar = gerar_refeicao_fixa(tipo_proteina, incluir_legume, contador_carbo, alimentos_dict)
-            id_atual = extrair_id_refeicao(jantar)
 
-            if id_atual != ultima_refeicao_id:
-                proteinas_semana.remove(tipo_proteina)
-                break
+def gerar_cardapio_cacheado(morador_id, catalogo, semente, economico=False):
+    chave = (morador_id, semente, catalogo.versao, economico)
+    semana = _cache_semanas.obter_ou_criar(
+        chave,
+        lambda: gerar_cardapio(morador_id, catalogo, rng=random.Random(semente), economico=economico),
+    )
+    # As trocas de refeicao alteram a semana; o cache guarda o original.
+    return copy.deepcopy(semana)
 
-        ultima_refeicao_id = id_atual
-        semana.append({"Dia": dia, KEY_ALMOCO: almoco, "Lanche": lanche, "Jantar": jantar})
 
+def _identificar_refeicao(ref, catalogo):
+    proteina = ref["proteina"]
+    if proteina.get("tipo") == "ovos":
+        tipo_proteina = "Ovos"
+    else:
+        item = catalogo.buscar(proteina["nome"])
+        tipo_proteina = item.tipo if item and item.tipo else proteina["nome"]
+    return tipo_proteina, catalogo.buscar(ref["carbo"]["nome"])
+
+
+def criar_estado_semana(semana, catalogo):
+    estado = EstadoSemana(total_refeicoes=2 * len(semana))
+    for indice, d in enumerate(semana):
+        for deslocamento, chave in enumerate((KEY_ALMOCO, "Jantar")):
+            tipo_proteina, carbo = _identificar_refeicao(d[chave], catalogo)
+            if carbo:
+                estado.registrar(2 * indice + deslocamento, tipo_proteina, carbo)
+        if d["Lanche"].get("tipo") == "rap10":
+            estado.rap10_count += 1
+    return estado
+
+
+def _regenerar_refeicao(semana, dia_index, chave, catalogo, estado, rng, lista=None):
+    rng = obter_rng(rng)
+    if estado is None:
+        estado = criar_estado_semana(semana, catalogo)
+
+    posicao = 2 * dia_index + (0 if chave == KEY_ALMOCO else 1)
+    tipo_proteina, carbo = escolher_refeicao(catalogo, estado, posicao, rng)
+    legume = sortear_legume(catalogo, rng)
+    antiga = semana[dia_index][chave]
+    semana[dia_index][chave] = montar_refeicao(tipo_proteina, carbo, legume, catalogo, rng)
+    if lista is not None:
+        lista.trocar_refeicao(antiga, semana[dia_index][chave])
     return semana
 
 
-def regenerar_almoco(semana, dia_index, alimentos):
-    alimentos_dict = organizar_alimentos_por_nome(alimentos)
-    opcoes = _opcoes_proteina(alimentos_dict)
-    if not opcoes:
-        raise ValueError("Sem proteinas disponiveis.")
-    tipo_proteina = _escolher_proteina_almoco(opcoes)
-    novo_almoco = gerar_refeicao_fixa(tipo_proteina, True, _contador_inicial_carbo(), alimentos_dict)
-    semana[dia_index][KEY_ALMOCO] = novo_almoco
-    return semana
+def regenerar_almoco(semana, dia_index, catalogo, estado=None, rng=None, lista=None):
+    return _regenerar_refeicao(semana, dia_index, KEY_ALMOCO, catalogo, estado, rng, lista)
 
 
-def regenerar_lanche(semana, dia_index):
-    rap10_count = sum(1 for d in semana if d["Lanche"].get("tipo") == "rap10")
-    semana[dia_index]["Lanche"] = gerar_lanche(rap10_count, limite_rap10=3)
+def regenerar_lanche(semana, dia_index, estado=None, rng=None, catalogo=None, lista=None):
+    era_rap10 = semana[dia_index]["Lanche"].get("tipo") == "rap10"
+    if estado is None:
+        rap10_count = sum(1 for d in semana if d["Lanche"].get("tipo") == "rap10")
+    else:
+        rap10_count = estado.rap10_count
+    # O lanche trocado nao conta para o limite.
+    rap10_count -= int(era_rap10)
+
+    tabela = catalogo.lanches if catalogo else None
+    novo_lanche = gerar_lanche(rap10_count, limite_rap10=LIMITE_RAP10, rng=rng, tabela=tabela)
+    antigo = semana[dia_index]["Lanche"]
+    semana[dia_index]["Lanche"] = novo_lanche
+    if estado is not None:
+        estado.trocar_lanche(era_rap10, novo_lanche["tipo"] == "rap10")
+    if lista is not None:
+        lista.trocar_lanche(antigo, novo_lanche)
     return semana
 
 
-def regenerar_jantar(semana, dia_index, alimentos):
-    alimentos_dict = organizar_alimentos_por_nome(alimentos)
-    opcoes = _opcoes_proteina(alimentos_dict)
-    if not opcoes:
-        raise ValueError("Sem proteinas disponiveis.")
-    tipo_proteina = random.choice(opcoes)
-    novo_jantar = gerar_refeicao_fixa(tipo_proteina, True, _contador_inicial_carbo(), alimentos_dict)
-    semana[dia_index]["Jantar"] = novo_jantar
-    return semana
+def regenerar_jantar(semana, dia_index, catalogo, estado=None, rng=None, lista=None):
+    return _regenerar_refeicao(semana, dia_index, "Jantar", catalogo, estado, rng, lista)
@@ -0,0 +1,151 @@
+"""
+core/lanches.py
+-------------------------------------------------------
+Tabela de lanches.
+
+Cada lanche e um registro (nome, gramas, tipo, peso);
+o Rap10 entra como uma linha por combinacao de
+recheios. A tabela pode vir do banco (por usuario) ou
+do padrao abaixo, usado tambem quando nenhum lanche
+do usuario tem peso e gramas positivos.
+
+O sorteio usa o metodo de alias (Vose): as tabelas
+sao montadas uma vez e cada sorteio custa dois numeros
+aleatorios, tanto no gerador quanto no lote (NumPy).
+Ha uma tabela com Rap10 e outra sem, para quando o
+limite semanal ja foi atingido.
+-------------------------------------------------------
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+from core.classificacao import classificar
+
+OPCOES_LANCHE = [
+    "Banana + Aveia",
+    "Sanduiche Presunto + Mussarela",
+    "Pao + Banana + Pasta de Amendoim",
+    "Vitamina de Banana + Aveia",
+]
+PESOS_LANCHE = [3, 2, 2, 2]
+RECHEIOS_RAP10 = ["Frango Desfiado", "Presunto", "Queijo"]
+PESO_RAP10 = 1
+GRAMAS_LANCHE_PADRAO = 220
+
+TIPO_RAP10 = "rap10"
+TIPO_SIMPLES = "simples"
+
+
+def gramas_padrao_lanche(nome, padrao=GRAMAS_LANCHE_PADRAO):
+    classe = classificar(nome)
+    return classe.gramas if classe.categoria == "lanche" else padrao
+
+
+def tipo_padrao_lanche(nome):
+    return TIPO_RAP10 if nome.startswith("Rap10") else TIPO_SIMPLES
+
+
+def lanches_padrao():
+    definicoes = [
+        (nome, gramas_padrao_lanche(nome), TIPO_SIMPLES, float(peso))
+        for nome, peso in zip(OPCOES_LANCHE, PESOS_LANCHE)
+    ]
+
+    # Um ou dois recheios com a mesma chance; a ordem entra no nome.
+    simples = [[r] for r in RECHEIOS_RAP10]
+    pares = [[a, b] for a in RECHEIOS_RAP10 for b in RECHEIOS_RAP10 if a != b]
+    for grupo in (simples, pares):
+        for recheios in grupo:
+            nome = "Rap10 + " + " + ".join(recheios)
+            definicoes.append((nome, gramas_padrao_lanche(nome), TIPO_RAP10, PESO_RAP10 / 2 / len(grupo)))
+
+    return tuple(definicoes)
+
+
+LANCHES_PADRAO = lanches_padrao()
+
+
+def tabela_alias(pesos):
+    n = len(pesos)
+    total = float(sum(pesos))
+    if n == 0 or total <= 0:
+        return None
+
+    prob = [p * n / total for p in pesos]
+    alias = list(range(n))
+    pequenos = [i for i, p in enumerate(prob) if p < 1.0]
+    grandes = [i for i, p in enumerate(prob) if p >= 1.0]
+
+    while pequenos and grandes:
+        menor = pequenos.pop()
+        maior = grandes.pop()
+        alias[menor] = maior
+        prob[maior] -= 1.0 - prob[menor]
+        (pequenos if prob[maior] < 1.0 else grandes).append(maior)
+
+    # Sobras por arredondamento ficam com probabilidade 1.
+    for i in pequenos + grandes:
+        prob[i] = 1.0
+    return prob, alias
+
+
+class TabelaLanches:
+    __slots__ = ("nomes", "gramas", "tipos", "pesos", "rap10", "indice", "_alias", "_alias_np")
+
+    def __init__(self, definicoes):
+        if not definicoes:
+            raise ValueError("A tabela de lanches precisa de pelo menos um lanche.")
+
+        self.nomes = tuple(d[0] for d in definicoes)
+        self.gramas = tuple(int(d[1]) for d in definicoes)
+        self.tipos = tuple(d[2] for d in definicoes)
+        self.pesos = tuple(float(d[3]) for d in definicoes)
+        self.rap10 = np.array([tipo == TIPO_RAP10 for tipo in self.tipos])
+        self.indice = {nome: i for i, nome in enumerate(self.nomes)}
+
+        com_rap10 = tabela_alias(self.pesos)
+        if com_rap10 is None:
+            raise ValueError("A tabela de lanches precisa de pelo menos um lanche com peso positivo.")
+        # Sem lanche simples, o limite de Rap10 nao tem como ser respeitado.
+        sem_rap10 = tabela_alias(
+            [0.0 if tipo == TIPO_RAP10 else peso for tipo, peso in zip(self.tipos, self.pesos)]
+        ) or com_rap10
+
+        self._alias = {True: com_rap10, False: sem_rap10}
+        self._alias_np = {
+            chave: (np.array(prob), np.array(alias))
+            for chave, (prob, alias) in self._alias.items()
+        }
+
+    def __len__(self):
+        return len(self.nomes)
+
+    def sortear(self, rng, permitir_rap10=True):
+        prob, alias = self._alias[permitir_rap10]
+        i = int(rng.random() * len(prob))
+        return i if rng.random() < prob[i] else alias[i]
+
+    def sortear_lote(self, gerador, tamanho, permitir_rap10=True):
+        prob, alias = self._alias_np[permitir_rap10]
+        i = gerador.integers(0, len(prob), size=tamanho)
+        return np.where(gerador.random(tamanho) < prob[i], i, alias[i])
+
+    def gramas_de(self, nome, padrao=GRAMAS_LANCHE_PADRAO):
+        i = self.indice.get(nome)
+        return self.gramas[i] if i is not None else gramas_padrao_lanche(nome, padrao)
+
+    def montar(self, indice):
+        return {"tipo": self.tipos[indice], "nome": self.nomes[indice], "gramas": self.gramas[indice]}
+
+    def montar_por_nome(self, nome):
+        i = self.indice.get(nome)
+        if i is not None:
+            return self.montar(i)
+        return {"tipo": tipo_padrao_lanche(nome), "nome": nome, "gramas": self.gramas_de(nome)}
+
+
+@lru_cache(maxsize=64)
+def tabela_lanches(definicoes=None):
+    return TabelaLanches(definicoes or LANCHES_PADRAO)
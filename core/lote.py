@@ -0,0 +1,308 @@
+"""
+core/lote.py
+-------------------------------------------------------
+Geracao vetorizada de muitas semanas de uma vez.
+
+Proteinas, carbos, legumes e lanches viram codigos
+inteiros e cada semana e uma linha de arrays NumPy:
+- refeicoes: (n, 7, 3) -> almoco, lanche, jantar
+  almoco/jantar = proteina * n_carbos + carbo
+- legumes:   (n, 7, 2) -> legume do almoco e do jantar
+
+Limites de carbo (rigidos), regras de combinacao e a
+proibicao de refeicoes iguais em sequencia sao
+aplicados como mascaras sobre o lote inteiro, com a
+mesma poda de capacidade do planejador escalar. As
+proteinas saem com os mesmos pesos do gerador,
+sorteadas horario a horario; a linha que fica sem
+opcao e refeita pela busca com retrocesso.
+-------------------------------------------------------
+"""
+
+import random
+
+import numpy as np
+
+from config import GRAMAS_OVOS, OVOS_POR_REFEICAO, PRECO_OVO, PRECO_RAP10
+from core.gerador import (
+    DIAS_SEMANA,
+    KEY_ALMOCO,
+    LIMITE_RAP10,
+    montar_refeicao,
+)
+from core.planejador import (
+    BONUS_OVOS_ALMOCO,
+    CardapioInviavel,
+    diagnosticar,
+    maximo_por_proteina,
+    planejar_refeicoes,
+)
+
+
+class LoteCardapios:
+    __slots__ = ("catalogo", "tipos_proteina", "refeicoes", "legumes", "repeticoes")
+
+    def __init__(self, catalogo, tipos_proteina, refeicoes, legumes, repeticoes):
+        self.catalogo = catalogo
+        self.tipos_proteina = tipos_proteina
+        self.refeicoes = refeicoes
+        self.legumes = legumes
+        self.repeticoes = repeticoes
+
+    def __len__(self):
+        return self.refeicoes.shape[0]
+
+    @property
+    def proteinas(self):
+        return self.refeicoes[:, :, [0, 2]] // len(self.catalogo.carbos)
+
+    @property
+    def carbos(self):
+        return self.refeicoes[:, :, [0, 2]] % len(self.catalogo.carbos)
+
+    @property
+    def lanches(self):
+        return self.refeicoes[:, :, 1]
+
+    def _tabela(self, por_proteina, por_carbo, por_legume, por_lanche):
+        carbos = self.carbos
+        total = por_proteina[self.proteinas].sum(axis=2) + por_carbo[carbos].sum(axis=2)
+        if len(por_legume):
+            total = total + np.where(self.legumes >= 0, por_legume[self.legumes], 0).sum(axis=2)
+        return total + por_lanche[self.lanches]
+
+    def componentes(self):
+        # (n, 7, 7): proteina, carbo, legume do almoco e do jantar + lanche.
+        catalogo = self.catalogo
+        n, dias, _ = self.refeicoes.shape
+        por_proteina = np.array([
+            GRAMAS_OVOS if t == "Ovos" else catalogo.proteina(t).gramas
+            for t in self.tipos_proteina
+        ])
+        proteina_ovos = np.array([t == "Ovos" for t in self.tipos_proteina])
+        por_carbo = np.array([c.gramas for c in catalogo.carbos])
+        por_legume = np.array([leg.gramas for leg in catalogo.legumes] + [0])
+
+        proteinas = self.proteinas
+        gramas = np.zeros((n, dias, 7))
+        gramas[:, :, [0, 3]] = por_proteina[proteinas]
+        gramas[:, :, [1, 4]] = por_carbo[self.carbos]
+        gramas[:, :, [2, 5]] = por_legume[self.legumes]
+        gramas[:, :, 6] = np.array(catalogo.lanches.gramas)[self.lanches]
+
+        ajustavel = gramas > 0
+        ajustavel[:, :, [0, 3]] &= ~proteina_ovos[proteinas]
+        ajustavel[:, :, 6] = False
+        return gramas, ajustavel
+
+    def gramas_por_dia(self):
+        catalogo = self.catalogo
+        por_proteina = np.array([
+            GRAMAS_OVOS if t == "Ovos" else catalogo.proteina(t).gramas
+            for t in self.tipos_proteina
+        ])
+        return self._tabela(
+            por_proteina,
+            np.array([c.gramas for c in catalogo.carbos]),
+            np.array([leg.gramas for leg in catalogo.legumes]),
+            np.array(catalogo.lanches.gramas),
+        )
+
+    def custo_semanal(self):
+        catalogo = self.catalogo
+
+        def custo(item):
+            return item.gramas / 1000 * float(item.preco)
+
+        por_proteina = np.array([
+            OVOS_POR_REFEICAO * PRECO_OVO if t == "Ovos" else custo(catalogo.proteina(t))
+            for t in self.tipos_proteina
+        ])
+        por_dia = self._tabela(
+            por_proteina,
+            np.array([custo(c) for c in catalogo.carbos]),
+            np.array([custo(leg) for leg in catalogo.legumes]),
+            np.where(catalogo.lanches.rap10, PRECO_RAP10, 0.0),
+        )
+        return por_dia.sum(axis=1)
+
+    def _contagem(self, codigos, total):
+        # Ocorrencias de cada codigo por semana: (n, total).
+        planos = codigos.reshape(len(self), -1)
+        contagem = np.zeros((len(self), total), dtype=np.int16)
+        for codigo in range(total):
+            contagem[:, codigo] = (planos == codigo).sum(axis=1)
+        return contagem
+
+    def contagem_carbos(self):
+        return self._contagem(self.carbos, len(self.catalogo.carbos))
+
+    def consumo_semanal(self):
+        # Colunas: (nome, unidade) de cada alimento; kg ou unidades por semana.
+        catalogo = self.catalogo
+        colunas = []
+        blocos = []
+
+        por_proteina = self._contagem(self.proteinas, len(self.tipos_proteina))
+        for p, tipo in enumerate(self.tipos_proteina):
+            if tipo == "Ovos":
+                colunas.append(("Ovos", "un"))
+                blocos.append(por_proteina[:, p] * OVOS_POR_REFEICAO)
+            else:
+                item = catalogo.proteina(tipo)
+                colunas.append((item.nome, "kg"))
+                blocos.append(por_proteina[:, p] * item.gramas / 1000)
+
+        por_carbo = self.contagem_carbos()
+        for c, item in enumerate(catalogo.carbos):
+            colunas.append((item.nome, "kg"))
+            blocos.append(por_carbo[:, c] * item.gramas / 1000)
+
+        if catalogo.legumes:
+            por_legume = self._contagem(self.legumes, len(catalogo.legumes))
+            for j, item in enumerate(catalogo.legumes):
+                colunas.append((item.nome, "kg"))
+                blocos.append(por_legume[:, j] * item.gramas / 1000)
+
+        colunas.append(("Rap10", "un"))
+        blocos.append(catalogo.lanches.rap10[self.lanches].sum(axis=1))
+
+        return colunas, np.stack(blocos, axis=1).astype(np.float32)
+
+    def semana(self, indice, rng=None):
+        catalogo = self.catalogo
+        semana = []
+        for dia, (almoco, lanche, jantar) in enumerate(self.refeicoes[indice]):
+            refeicoes = []
+            for posicao, codigo in enumerate((almoco, jantar)):
+                proteina, carbo = divmod(int(codigo), len(catalogo.carbos))
+                legume = int(self.legumes[indice, dia, posicao])
+                refeicoes.append(
+                    montar_refeicao(
+                        self.tipos_proteina[proteina],
+                        catalogo.carbos[carbo],
+                        catalogo.legumes[legume] if legume >= 0 else None,
+                        catalogo,
+                        rng,
+                    )
+                )
+            semana.append(
+                {
+                    "Dia": DIAS_SEMANA[dia],
+                    KEY_ALMOCO: refeicoes[0],
+                    "Lanche": catalogo.lanches.montar(int(lanche)),
+                    "Jantar": refeicoes[1],
+                }
+            )
+        return semana
+
+    def semanas(self):
+        for indice in range(len(self)):
+            yield self.semana(indice)
+
+
+def gerar_cardapios_lote(catalogo, n, seed=None):
+    dias = len(DIAS_SEMANA)
+    total_refeicoes = 2 * dias
+
+    motivo = diagnosticar(catalogo, total_refeicoes)
+    if motivo:
+        raise CardapioInviavel(motivo)
+
+    rng = np.random.default_rng(seed)
+    linhas = np.arange(n)
+
+    tipos_proteina = list(dict.fromkeys(catalogo.opcoes_proteina))
+    pesos = np.array([catalogo.opcoes_proteina.count(t) for t in tipos_proteina], dtype=float)
+    bonus_ovos = np.array([BONUS_OVOS_ALMOCO if t == "Ovos" else 0 for t in tipos_proteina], dtype=float)
+    maximos = np.array([maximo_por_proteina(catalogo, t, total_refeicoes) for t in tipos_proteina])
+
+    n_proteinas = len(tipos_proteina)
+    n_carbos = len(catalogo.carbos)
+    compat = np.array(catalogo.regras.matriz(tipos_proteina), dtype=bool)
+    limites = np.array(catalogo.regras.limites)
+    # Carbo aceito por uma unica proteina: (carbo, refeicao) como no planejador.
+    unicas = [
+        (j, int(np.flatnonzero(compat[:, j])[0]) * n_carbos + j)
+        for j in range(n_carbos)
+        if compat[:, j].sum() == 1
+    ]
+    codigos = np.arange(n_proteinas * n_carbos).reshape(n_proteinas, n_carbos)
+
+    combos = np.empty((n, total_refeicoes), dtype=np.int16)
+    contagem = np.zeros((n, n_carbos), dtype=np.int16)
+    por_proteina = np.zeros((n, n_proteinas), dtype=np.int16)
+    anterior = np.full(n, -1)
+    sem_saida = np.zeros(n, dtype=bool)
+
+    # Mesmas regras rigidas do planejador escalar, horario a horario, com
+    # a mesma poda de capacidade; linhas que ainda assim ficam sem
+    # opcao sao refeitas pela busca com retrocesso no fim.
+    for t in range(total_refeicoes):
+        restantes = total_refeicoes - t - 1
+        livres = limites - contagem
+        # (n, proteina, carbo)
+        mascara = compat[None] & (livres > 0)[:, None, :]
+        mascara &= (por_proteina < maximos)[:, :, None]
+        mascara &= codigos[None] != anterior[:, None, None]
+
+        folga = livres.sum(axis=1) - 1 - restantes
+        mascara &= (folga >= 0)[:, None, None]
+        for j, refeicao in unicas:
+            depois = livres[:, j][:, None, None] - (np.arange(n_carbos) == j)[None, None, :]
+            livre = np.where(codigos == refeicao, 0, 1)[None]
+            mascara &= depois - folga[:, None, None] <= (restantes + livre) // 2
+
+        sem_saida |= ~mascara.any(axis=(1, 2))
+        mascara[sem_saida] = compat[None].repeat(sem_saida.sum(), axis=0)
+
+        # Proteina pelo peso (ovos valem mais no almoco), carbo uniforme.
+        peso = pesos + (bonus_ovos if t % 2 == 0 else 0)
+        chances = np.where(mascara.any(axis=2), peso, 0.0)
+        acumulado = chances.cumsum(axis=1)
+        sorteio = rng.random(n) * acumulado[:, -1]
+        prot = (acumulado <= sorteio[:, None]).sum(axis=1)
+
+        chaves = rng.random((n, n_carbos))
+        chaves[~mascara[linhas, prot]] = -1.0
+        carbo = chaves.argmax(axis=1)
+
+        contagem[linhas, carbo] += 1
+        por_proteina[linhas, prot] += 1
+        combos[:, t] = prot * n_carbos + carbo
+        anterior = combos[:, t].astype(np.int64)
+
+    if sem_saida.any():
+        indice_carbo = {carbo.nome: j for j, carbo in enumerate(catalogo.carbos)}
+        indice_proteina = {tipo: p for p, tipo in enumerate(tipos_proteina)}
+        for linha in np.flatnonzero(sem_saida):
+            plano = planejar_refeicoes(
+                catalogo,
+                total_refeicoes,
+                rng=random.Random(int(rng.integers(2**63))),
+            )
+            combos[linha] = [indice_proteina[tipo] * n_carbos + indice_carbo[c.nome] for tipo, c in plano]
+    repeticoes = np.zeros(n, dtype=np.int8)
+
+    tabela = catalogo.lanches
+    rap10 = tabela.rap10
+    lanches = np.empty((n, dias), dtype=np.int16)
+    rap10_count = np.zeros(n, dtype=np.int8)
+    for d in range(dias):
+        escolha = tabela.sortear_lote(rng, n)
+        bloqueado = rap10[escolha] & (rap10_count >= LIMITE_RAP10)
+        escolha[bloqueado] = tabela.sortear_lote(rng, bloqueado.sum(), permitir_rap10=False)
+        rap10_count += rap10[escolha]
+        lanches[:, d] = escolha
+
+    refeicoes = np.empty((n, dias, 3), dtype=np.int16)
+    refeicoes[:, :, 0] = combos[:, 0::2]
+    refeicoes[:, :, 1] = lanches
+    refeicoes[:, :, 2] = combos[:, 1::2]
+
+    if catalogo.legumes:
+        legumes = rng.integers(0, len(catalogo.legumes), size=(n, dias, 2), dtype=np.int8)
+    else:
+        legumes = np.full((n, dias, 2), -1, dtype=np.int8)
+
+    return LoteCardapios(catalogo, tipos_proteina, refeicoes, legumes, repeticoes)
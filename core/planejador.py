@@ -0,0 +1,233 @@
+"""
+core/planejador.py
+-------------------------------------------------------
+Planejamento das refeicoes da semana como problema de
+restricoes:
+- sem refeicoes iguais em sequencia
+- limites semanais de carbo (LIMITES_CARBO)
+- regras de combinacao proteina x carbo
+- no maximo metade dos horarios para proteina de carbo unico
+
+Os limites de carbo sao rigidos: sem semana que os
+respeite, a busca falha com CardapioInviavel. Proteina
+e carbo de cada horario sao escolhidos na mesma busca
+com retrocesso, em ordem aleatoria, limitada so por
+numero de passos: a mesma semente da a mesma
+semana (ou o mesmo erro) em qualquer maquina e carga.
+Inviabilidade e informada antes da busca, com o motivo.
+-------------------------------------------------------
+"""
+
+from collections import Counter
+
+from core.aleatorio import obter_rng
+from core.regras import obter_limite_carbo
+
+MAX_ITERACOES = 20000
+
+# Peso extra de ovos no almoco.
+BONUS_OVOS_ALMOCO = 2
+
+
+class CardapioInviavel(ValueError):
+    pass
+
+
+def contador_inicial_carbo():
+    return {"Macarrao": 0, "Mandioca": 0, "Batata": 0}
+
+
+def id_refeicao(tipo_proteina, carbo):
+    return (tipo_proteina, carbo.nome)
+
+
+def carbos_permitidos(catalogo, tipo_proteina, contador_carbo):
+    regras = catalogo.regras
+    mascara = regras.permitidos(tipo_proteina, regras.livres(contador_carbo))
+    return catalogo.carbos_por_mascara[mascara]
+
+
+def maximo_por_proteina(catalogo, tipo_proteina, total_refeicoes):
+    # Proteina com um unico carbo possivel gera sempre a mesma refeicao,
+    # entao nao pode ocupar mais da metade dos horarios.
+    if len(catalogo.carbos_por_proteina.get(tipo_proteina, [])) == 1:
+        return (total_refeicoes + 1) // 2
+    return total_refeicoes
+
+
+def refeicao_unica_por_carbo(catalogo, tipos_proteina):
+    # Carbo aceito por uma unica proteina: so uma refeicao possivel com ele.
+    unicas = {}
+    for carbo in catalogo.carbos:
+        tipos = [tipo for tipo in tipos_proteina if carbo in catalogo.carbos_por_proteina[tipo]]
+        if len(tipos) == 1:
+            unicas[carbo.tipo] = id_refeicao(tipos[0], carbo)
+    return unicas
+
+
+def _carbos_viaveis(catalogo, contador_carbo, unicas, restantes, anterior):
+    # As refeicoes restantes cabem nos limites de carbo que sobraram?
+    livres = {
+        carbo.tipo: max(0, obter_limite_carbo(carbo.tipo) - contador_carbo.get(carbo.tipo, 0))
+        for carbo in catalogo.carbos
+    }
+    folga = sum(livres.values()) - restantes
+    if folga < 0:
+        return False
+    # O que um carbo de refeicao unica precisa ocupar nao pode repetir em sequencia.
+    for tipo_carbo, refeicao in unicas.items():
+        minimo = livres[tipo_carbo] - folga
+        livre = 0 if anterior == refeicao else 1
+        if minimo > (restantes + livre) // 2:
+            return False
+    return True
+
+
+def diagnosticar(catalogo, total_refeicoes=14):
+    if not catalogo.carbos:
+        return "Nenhum carbo disponivel para este morador."
+
+    tipos = list(dict.fromkeys(catalogo.opcoes_proteina))
+    if not tipos:
+        return "Nenhuma proteina disponivel para este morador."
+
+    refeicoes = {
+        (tipo, carbo.nome)
+        for tipo in tipos
+        for carbo in catalogo.carbos_por_proteina[tipo]
+    }
+    if len(refeicoes) < 2 and total_refeicoes > 1:
+        tipo, carbo = next(iter(refeicoes))
+        return (
+            f"Apenas uma combinacao possivel ({tipo} + {carbo}); "
+            "habilite mais proteinas ou carbos para evitar refeicoes repetidas em sequencia."
+        )
+
+    capacidade = sum(maximo_por_proteina(catalogo, tipo, total_refeicoes) for tipo in tipos)
+    if capacidade < total_refeicoes:
+        return (
+            "Proteinas insuficientes para variar as refeicoes: "
+            "cada proteina disponivel aceita um unico carbo."
+        )
+
+    alcancaveis = {carbo.tipo for tipo in tipos for carbo in catalogo.carbos_por_proteina[tipo]}
+    capacidade = sum(obter_limite_carbo(tipo) for tipo in alcancaveis)
+    if capacidade < total_refeicoes:
+        return (
+            f"Os limites semanais de carbo cobrem so {capacidade} de {total_refeicoes} refeicoes; "
+            "habilite mais carbos ou proteinas que os aceitem."
+        )
+
+    return None
+
+
+def ordem_aleatoria(itens, pesos, rng):
+    # Sorteio ponderado sem reposicao (chaves de Efraimidis-Spirakis).
+    chaves = [rng.random() ** (1.0 / peso) for peso in pesos]
+    return [item for _, item in sorted(zip(chaves, itens), key=lambda par: par[0], reverse=True)]
+
+
+def planejar_refeicoes(
+    catalogo,
+    total_refeicoes=14,
+    rng=None,
+    max_iteracoes=MAX_ITERACOES,
+    anterior=None,
+):
+    rng = obter_rng(rng)
+    motivo = diagnosticar(catalogo, total_refeicoes)
+    if motivo:
+        raise CardapioInviavel(motivo)
+
+    pesos_base = Counter(catalogo.opcoes_proteina)
+    maximos = {tipo: maximo_por_proteina(catalogo, tipo, total_refeicoes) for tipo in pesos_base}
+    unicas = refeicao_unica_por_carbo(catalogo, pesos_base)
+    proteinas = Counter()
+    contador_carbo = contador_inicial_carbo()
+    plano = []
+    passos = 0
+
+    def buscar(indice, anterior):
+        nonlocal passos
+        if indice == total_refeicoes:
+            return True
+
+        passos += 1
+        if passos > max_iteracoes:
+            raise CardapioInviavel(
+                "Nao foi possivel montar a semana dentro do limite de tentativas; "
+                "revise as restricoes e porcoes deste morador."
+            )
+
+        almoco = indice % 2 == 0
+        tipos = [tipo for tipo in pesos_base if proteinas[tipo] < maximos[tipo]]
+        pesos = [
+            pesos_base[tipo] + (BONUS_OVOS_ALMOCO if almoco and tipo == "Ovos" else 0)
+            for tipo in tipos
+        ]
+        restantes = total_refeicoes - indice - 1
+
+        # A proteina e escolhida aqui, junto com o carbo: com os limites
+        # de carbo rigidos, um pool sorteado antes pode nao ter solucao.
+        for tipo in ordem_aleatoria(tipos, pesos, rng):
+            carbos = carbos_permitidos(catalogo, tipo, contador_carbo)
+            for carbo in rng.sample(carbos, len(carbos)):
+                atual = id_refeicao(tipo, carbo)
+                if atual == anterior:
+                    continue
+
+                proteinas[tipo] += 1
+                contador_carbo[carbo.tipo] += 1
+                plano.append((tipo, carbo))
+
+                if _carbos_viaveis(catalogo, contador_carbo, unicas, restantes, atual) and buscar(
+                    indice + 1, atual
+                ):
+                    return True
+
+                plano.pop()
+                contador_carbo[carbo.tipo] -= 1
+                proteinas[tipo] -= 1
+
+        return False
+
+    if not buscar(0, anterior):
+        raise CardapioInviavel("Nenhuma combinacao de refeicoes atende os limites de carbo da semana.")
+
+    return plano
+
+
+def escolher_refeicao(catalogo, estado, posicao, rng=None):
+    rng = obter_rng(rng)
+    total_refeicoes = len(estado.refeicoes)
+    anterior = estado.remover(posicao)
+    vizinhos = estado.vizinhos(posicao)
+
+    pesos_base = Counter(catalogo.opcoes_proteina)
+    tipos = [
+        tipo for tipo in pesos_base
+        if estado.proteinas[tipo] < maximo_por_proteina(catalogo, tipo, total_refeicoes)
+    ]
+    almoco = posicao % 2 == 0
+    pesos = [
+        pesos_base[tipo] + (BONUS_OVOS_ALMOCO if almoco and tipo == "Ovos" else 0)
+        for tipo in tipos
+    ]
+
+    # contador_carbo ja esta sem a refeicao trocada: so entram carbos
+    # com limite sobrando na semana; sem nenhum, a troca nao acontece.
+    for tipo in ordem_aleatoria(tipos, pesos, rng):
+        carbos = [
+            c for c in carbos_permitidos(catalogo, tipo, estado.contador_carbo)
+            if id_refeicao(tipo, c) not in vizinhos
+        ]
+        if carbos:
+            carbo = rng.choice(carbos)
+            estado.registrar(posicao, tipo, carbo)
+            return tipo, carbo
+
+    estado.repor(posicao, anterior)
+    raise CardapioInviavel(
+        "Nenhuma outra refeicao cabe nos limites de carbo da semana "
+        "e combina com as refeicoes vizinhas deste dia."
+    )
@@ -0,0 +1,110 @@
+"""
+core/porcoes.py
+-------------------------------------------------------
+Ajuste de porcoes para bater a meta diaria (g).
+
+Cada componente ajustavel recebe um fator s_i dentro de
+[PORCAO_FATOR_MIN, PORCAO_FATOR_MAX]. Entre os fatores
+que fecham a meta, escolhe o mais proximo de 1:
+
+    min sum (s_i - 1)^2  com  sum g_i * s_i = meta
+
+A solucao e s_i = clip(1 + lambda * g_i). A soma e
+linear por partes em lambda, com quebras onde algum
+fator bate no limite; o lambda exato sai da ordenacao
+dessas quebras, para todos os dias (e semanas) de uma
+vez. Ovos e lanches ficam fixos.
+-------------------------------------------------------
+"""
+
+import copy
+
+import numpy as np
+
+from config import PORCAO_FATOR_MAX, PORCAO_FATOR_MIN, PORCAO_PASSO_GRAMAS
+from core.gerador import KEY_ALMOCO
+from core.preparos import formatar_refeicao
+
+COMPONENTES_REFEICAO = ("proteina", "carbo", "legume")
+
+
+def ajustar_porcoes(gramas, meta, ajustavel=None, minimo=PORCAO_FATOR_MIN, maximo=PORCAO_FATOR_MAX):
+    gramas = np.asarray(gramas, dtype=float)
+    if ajustavel is None:
+        ajustavel = gramas > 0
+    ajustavel = ajustavel & (gramas > 0)
+
+    g = np.where(ajustavel, gramas, 0.0)
+    alvo = np.broadcast_to(np.asarray(meta, dtype=float), gramas.shape[:-1]) - (gramas - g).sum(axis=-1)
+
+    inverso = np.divide(1.0, g, out=np.zeros_like(g), where=g > 0)
+    quebras = np.sort(
+        np.concatenate(((minimo - 1.0) * inverso, (maximo - 1.0) * inverso), axis=-1),
+        axis=-1,
+    )
+
+    # Soma ajustada em cada quebra: (..., 2k).
+    fatores_quebra = np.clip(1.0 + quebras[..., :, None] * g[..., None, :], minimo, maximo)
+    somas = (fatores_quebra * g[..., None, :]).sum(axis=-1)
+
+    ultimo = quebras.shape[-1] - 1
+    j = np.clip((somas <= alvo[..., None]).sum(axis=-1) - 1, 0, max(ultimo - 1, 0))
+    j = j[..., None]
+    q0 = np.take_along_axis(quebras, j, axis=-1)[..., 0]
+    q1 = np.take_along_axis(quebras, np.minimum(j + 1, ultimo), axis=-1)[..., 0]
+    s0 = np.take_along_axis(somas, j, axis=-1)[..., 0]
+    s1 = np.take_along_axis(somas, np.minimum(j + 1, ultimo), axis=-1)[..., 0]
+
+    inclinacao = np.divide(q1 - q0, s1 - s0, out=np.zeros_like(q0), where=s1 > s0)
+    lam = q0 + (alvo - s0) * inclinacao
+
+    fatores = np.clip(1.0 + lam[..., None] * g, minimo, maximo)
+    return np.where(ajustavel, fatores, 1.0)
+
+
+def _matriz_semana(semana):
+    gramas = np.zeros((len(semana), 7))
+    ajustavel = np.zeros((len(semana), 7), dtype=bool)
+    for dia, d in enumerate(semana):
+        for r, chave in enumerate((KEY_ALMOCO, "Jantar")):
+            ref = d[chave]
+            for c, componente in enumerate(COMPONENTES_REFEICAO):
+                item = ref.get(componente)
+                if not isinstance(item, dict):
+                    continue
+                gramas[dia, 3 * r + c] = item.get("g") or item.get("gramas") or 0
+                ajustavel[dia, 3 * r + c] = item.get("tipo") != "ovos"
+        gramas[dia, 6] = d["Lanche"].get("gramas") or 0
+    return gramas, ajustavel
+
+
+def ajustar_semana(
+    semana,
+    meta,
+    minimo=PORCAO_FATOR_MIN,
+    maximo=PORCAO_FATOR_MAX,
+    passo=PORCAO_PASSO_GRAMAS,
+):
+    if not semana:
+        return semana
+
+    gramas, ajustavel = _matriz_semana(semana)
+    fatores = ajustar_porcoes(gramas, meta, ajustavel, minimo, maximo)
+    novas = np.rint(gramas * fatores / passo) * passo
+
+    ajustada = copy.deepcopy(semana)
+    for dia, d in enumerate(ajustada):
+        for r, chave in enumerate((KEY_ALMOCO, "Jantar")):
+            ref = d[chave]
+            for c, componente in enumerate(COMPONENTES_REFEICAO):
+                if ajustavel[dia, 3 * r + c]:
+                    ref[componente].pop("g", None)
+                    ref[componente]["gramas"] = int(novas[dia, 3 * r + c])
+            formatar_refeicao(ref)
+    return ajustada
+
+
+def ajustar_lote(lote, meta, minimo=PORCAO_FATOR_MIN, maximo=PORCAO_FATOR_MAX):
+    gramas, ajustavel = lote.componentes()
+    fatores = ajustar_porcoes(gramas, meta, ajustavel, minimo, maximo)
+    return gramas * fatores
@@ -3,56 +3,88 @@ core/preparos.py
 -------------------------------------------------------
 Formata o nome final das refeicoes.
 Usa preparos customizados por alimento quando existirem.
+
+O preparo sorteado fica salvo na refeicao, entao o
+texto pode ser refeito (ex.: apos ajustar porcoes) sem
+sortear de novo.
 -------------------------------------------------------
 """
 
-import random
-
 from config import PREPARO_CARBO, PREPARO_FRANGO
+from core.aleatorio import obter_rng
+from core.classificacao import tipo_na_categoria
+
+PREPAROS_PADRAO_PROTEINA = {
+    "Frango": PREPARO_FRANGO,
+    "Hamburguer": ["Grelhado"],
+}
+
+PREPAROS_PADRAO_CARBO = {
+    "Batata": PREPARO_CARBO["Batata"],
+    "Mandioca": PREPARO_CARBO["Mandioca"],
+    "Macarrao": PREPARO_CARBO.get("Macarrao") or PREPARO_CARBO.get("Macarrão", ["Simples"]),
+}
 
 
 def _obter_gramas(item):
     return item.get("g") or item.get("gramas") or 0
 
 
-def _escolher_preparo(item, fallback):
+def _escolher_preparo(item, fallback, rng):
     opcoes = item.get("preparos") or fallback
-    return random.choice(opcoes)
+    return rng.choice(opcoes)
+
+
+def _tipo_proteina(proteina):
+    if not isinstance(proteina, dict):
+        return None
+    if proteina.get("tipo") == "ovos":
+        return "ovos"
+    return tipo_na_categoria(proteina.get("nome", ""), "proteina")
+
+
+def _tipo_carbo(carbo):
+    return tipo_na_categoria(carbo.get("nome", ""), "carbo")
+
 
+def _com_peso(texto, peso):
+    return f"{texto} ({peso}g)" if peso else texto
 
-def aplicar_preparo(refeicao):
+
+def formatar_refeicao(refeicao):
     proteina = refeicao["proteina"]
     carbo = refeicao["carbo"]
 
-    if isinstance(proteina, dict) and proteina.get("tipo") == "ovos":
+    tipo = _tipo_proteina(proteina)
+    if tipo == "ovos":
         nome_proteina = f"Omelete ({proteina['quantidade']} ovos)"
-    elif isinstance(proteina, dict) and "Frango" in proteina.get("nome", ""):
-        preparo = _escolher_preparo(proteina, PREPARO_FRANGO)
-        peso = _obter_gramas(proteina)
-        nome_proteina = f"Frango {preparo} ({peso}g)" if peso else f"Frango {preparo}"
-    elif isinstance(proteina, dict) and "Hamb" in proteina.get("nome", ""):
-        preparo = _escolher_preparo(proteina, ["Grelhado"])
-        peso = _obter_gramas(proteina)
-        nome_proteina = f"Hamburguer {preparo} ({peso}g)" if peso else f"Hamburguer {preparo}"
+    elif tipo:
+        nome_proteina = _com_peso(f"{tipo} {refeicao['preparo_proteina']}", _obter_gramas(proteina))
     else:
         nome_proteina = proteina.get("nome", "Proteina")
 
-    nome_carbo_base = carbo.get("nome", "")
-    peso_carbo = _obter_gramas(carbo)
-
-    if "Batata" in nome_carbo_base:
-        preparo = _escolher_preparo(carbo, PREPARO_CARBO["Batata"])
-        nome_carbo = f"Batata {preparo} ({peso_carbo}g)" if peso_carbo else f"Batata {preparo}"
-    elif "Mandioca" in nome_carbo_base:
-        preparo = _escolher_preparo(carbo, PREPARO_CARBO["Mandioca"])
-        nome_carbo = f"Mandioca {preparo} ({peso_carbo}g)" if peso_carbo else f"Mandioca {preparo}"
-    elif "Macarr" in nome_carbo_base:
-        fallback = PREPARO_CARBO.get("Macarrao") or PREPARO_CARBO.get("Macarrão", ["Simples"])
-        preparo = _escolher_preparo(carbo, fallback)
-        nome_carbo = f"Macarrao {preparo} ({peso_carbo}g)" if peso_carbo else f"Macarrao {preparo}"
+    tipo = _tipo_carbo(carbo)
+    if tipo:
+        nome_carbo = _com_peso(f"{tipo} {refeicao['preparo_carbo']}", _obter_gramas(carbo))
     else:
-        nome_carbo = f"{nome_carbo_base} ({peso_carbo}g)" if peso_carbo else nome_carbo_base
+        nome_carbo = _com_peso(carbo.get("nome", ""), _obter_gramas(carbo))
 
     refeicao["proteina_formatada"] = nome_proteina
     refeicao["carbo_formatado"] = nome_carbo
     return refeicao
+
+
+def aplicar_preparo(refeicao, rng=None):
+    rng = obter_rng(rng)
+    proteina = refeicao["proteina"]
+    carbo = refeicao["carbo"]
+
+    tipo = _tipo_proteina(proteina)
+    if tipo in PREPAROS_PADRAO_PROTEINA:
+        refeicao["preparo_proteina"] = _escolher_preparo(proteina, PREPAROS_PADRAO_PROTEINA[tipo], rng)
+
+    tipo = _tipo_carbo(carbo)
+    if tipo:
+        refeicao["preparo_carbo"] = _escolher_preparo(carbo, PREPAROS_PADRAO_CARBO[tipo], rng)
+
+    return formatar_refeicao(refeicao)
@@ -2,9 +2,18 @@
 core/regras.py
 -------------------------------------------------------
 Regras de combinacao entre proteina e carboidrato.
+
+As regras sao compiladas uma vez por catalogo numa
+tabela de mascaras de bits: o bit j de uma proteina
+indica se o j-esimo carbo do catalogo e permitido.
+Filtrar vira um AND entre inteiros pequenos, usado
+tanto pelo gerador escalar quanto pelo lote.
 -------------------------------------------------------
 """
 
+from functools import lru_cache
+
+from config import LIMITES_CARBO
 
 REGRAS_COMBINACAO = {
     "Ovos": {"Macarrao", "Mandioca"},
@@ -12,44 +21,64 @@ REGRAS_COMBINACAO = {
 }
 
 
-def identificar_tipo_proteina(proteina):
-    if not isinstance(proteina, dict):
-        return None
+def obter_limite_carbo(tipo_carbo):
+    if tipo_carbo == "Macarrao":
+        return LIMITES_CARBO.get("Macarrao", LIMITES_CARBO.get("Macarrão", 999))
+    return LIMITES_CARBO.get(tipo_carbo, 999)
+
 
-    if proteina.get("tipo") == "ovos":
-        return "Ovos"
+def indices_mascara(mascara):
+    indices = []
+    j = 0
+    while mascara:
+        if mascara & 1:
+            indices.append(j)
+        mascara >>= 1
+        j += 1
+    return indices
 
-    nome = proteina.get("nome", "")
 
-    if "Hamb" in nome:
-        return "Hamburguer"
-    if "Frango" in nome:
-        return "Frango"
-    return nome
+class RegrasCompiladas:
+    __slots__ = ("tipos_proteina", "tipos_carbo", "mascaras", "limites", "todos")
 
+    def __init__(self, tipos_proteina, tipos_carbo):
+        self.tipos_proteina = tuple(tipos_proteina)
+        self.tipos_carbo = tuple(tipos_carbo)
+        self.todos = (1 << len(self.tipos_carbo)) - 1
+        self.limites = tuple(obter_limite_carbo(tipo) for tipo in self.tipos_carbo)
 
-def identificar_tipo_carbo(nome_carbo):
-    if "Macarr" in nome_carbo:
-        return "Macarrao"
-    if "Mandioca" in nome_carbo:
-        return "Mandioca"
-    if "Batata" in nome_carbo:
-        return "Batata"
-    return nome_carbo
+        self.mascaras = {}
+        for tipo in self.tipos_proteina:
+            proibidos = REGRAS_COMBINACAO.get(tipo, ())
+            mascara = 0
+            for j, tipo_carbo in enumerate(self.tipos_carbo):
+                if tipo_carbo not in proibidos:
+                    mascara |= 1 << j
+            # Regra que elimina todos os carbos e ignorada.
+            self.mascaras[tipo] = mascara or self.todos
 
+    def livres(self, contador_carbo):
+        mascara = 0
+        for j, (tipo, limite) in enumerate(zip(self.tipos_carbo, self.limites)):
+            if contador_carbo.get(tipo, 0) < limite:
+                mascara |= 1 << j
+        return mascara
 
-def aplicar_regras_inteligentes(proteina, carbos):
-    tipo_proteina = identificar_tipo_proteina(proteina)
-    if not tipo_proteina:
-        return carbos
+    def permitidos(self, tipo_proteina, livres=None):
+        mascara = self.mascaras[tipo_proteina]
+        if livres is None:
+            return mascara
+        # Limite de carbo e rigido: estourado em todos, nao sobra carbo.
+        return mascara & livres
 
-    proibidos = REGRAS_COMBINACAO.get(tipo_proteina)
-    if not proibidos:
-        return carbos
+    def matriz(self, tipos_proteina=None):
+        tipos = self.tipos_proteina if tipos_proteina is None else tipos_proteina
+        return [
+            [bool(self.mascaras[tipo] >> j & 1) for j in range(len(self.tipos_carbo))]
+            for tipo in tipos
+        ]
 
-    carbos_filtrados = [
-        c for c in carbos
-        if identificar_tipo_carbo(c) not in proibidos
-    ]
 
-    return carbos_filtrados if carbos_filtrados else carbos
+@lru_cache(maxsize=None)
+def compilar_regras(tipos_proteina, tipos_carbo):
+    return RegrasCompiladas(tipos_proteina, tipos_carbo)
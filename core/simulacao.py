@@ -0,0 +1,125 @@
+"""
+core/simulacao.py
+-------------------------------------------------------
+Simulacao Monte Carlo de custo e consumo semanal.
+
+Gera N semanas para um morador ou para a casa inteira
+(uma semana por morador, somadas) com o gerador em lote,
+dividindo o trabalho em blocos de TAMANHO_BLOCO semanas
+num ProcessPoolExecutor. Cada bloco recebe um fluxo
+aleatorio independente (SeedSequence.spawn); como os
+blocos dependem so de N, o resultado depende so da
+semente, nao da maquina nem do numero de processos.
+-------------------------------------------------------
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from core.gerador import LIMITE_RAP10
+from core.lote import gerar_cardapios_lote
+
+PERCENTIS = (5, 50, 95)
+
+# Abaixo disso o custo de subir processos nao compensa.
+MINIMO_PARALELO = 20000
+TAMANHO_BLOCO = 5000
+
+
+def _simular_bloco(catalogos, n, semente):
+    custo = np.zeros(n)
+    consumo = {}
+    repeticao = np.zeros(n, dtype=bool)
+    carbo_estourado = np.zeros(n, dtype=bool)
+    rap10_no_limite = np.zeros(n, dtype=bool)
+
+    for catalogo, semente_morador in zip(catalogos, semente.spawn(len(catalogos))):
+        lote = gerar_cardapios_lote(catalogo, n, seed=semente_morador)
+        custo += lote.custo_semanal()
+
+        colunas, quantidades = lote.consumo_semanal()
+        for j, coluna in enumerate(colunas):
+            consumo[coluna] = consumo[coluna] + quantidades[:, j] if coluna in consumo else quantidades[:, j]
+
+        limites = np.array(catalogo.regras.limites)
+        repeticao |= lote.repeticoes > 0
+        carbo_estourado |= (lote.contagem_carbos() > limites).any(axis=1)
+        rap10_no_limite |= quantidades[:, colunas.index(("Rap10", "un"))] >= LIMITE_RAP10
+
+    return {
+        "custo": custo,
+        "consumo": consumo,
+        "repeticao": repeticao,
+        "carbo_estourado": carbo_estourado,
+        "rap10_no_limite": rap10_no_limite,
+    }
+
+
+def _juntar_blocos(blocos):
+    colunas = list(dict.fromkeys(c for bloco in blocos for c in bloco["consumo"]))
+    consumo = {
+        coluna: np.concatenate([
+            bloco["consumo"].get(coluna, np.zeros(len(bloco["custo"]), dtype=np.float32))
+            for bloco in blocos
+        ])
+        for coluna in colunas
+    }
+    resultado = {"consumo": consumo}
+    for chave in ("custo", "repeticao", "carbo_estourado", "rap10_no_limite"):
+        resultado[chave] = np.concatenate([bloco[chave] for bloco in blocos])
+    return resultado
+
+
+def _resumir(dados):
+    custo = dados["custo"]
+    percentis_custo = np.percentile(custo, PERCENTIS)
+
+    linhas = []
+    for (nome, unidade), valores in dados["consumo"].items():
+        percentis = np.percentile(valores, PERCENTIS)
+        linha = {"Alimento": nome, "Unidade": unidade, "Media": round(float(valores.mean()), 2)}
+        for p, valor in zip(PERCENTIS, percentis):
+            linha[f"P{p}"] = round(float(valor), 2)
+        linhas.append(linha)
+
+    return {
+        "semanas": len(custo),
+        "custo_medio": round(float(custo.mean()), 2),
+        "custo_percentis": {p: round(float(v), 2) for p, v in zip(PERCENTIS, percentis_custo)},
+        "quantidades": pd.DataFrame(linhas),
+        "taxas": {
+            "refeicao_repetida": float(dados["repeticao"].mean()),
+            "limite_carbo_estourado": float(dados["carbo_estourado"].mean()),
+            "limite_rap10_atingido": float(dados["rap10_no_limite"].mean()),
+        },
+    }
+
+
+def simular_semanas(catalogos, n, seed=None, processos=None):
+    if n < 1:
+        raise ValueError(f"A simulacao precisa de pelo menos uma semana (n={n}).")
+    if not isinstance(catalogos, (list, tuple)):
+        catalogos = [catalogos]
+
+    tamanhos = [min(TAMANHO_BLOCO, n - inicio) for inicio in range(0, n, TAMANHO_BLOCO)]
+    sementes = np.random.SeedSequence(seed).spawn(len(tamanhos))
+
+    processos = processos or os.cpu_count() or 1
+    # Mesmos blocos e sementes em serie ou em paralelo.
+    if n < MINIMO_PARALELO or processos == 1:
+        blocos = [_simular_bloco(catalogos, tamanho, semente) for tamanho, semente in zip(tamanhos, sementes)]
+    else:
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            blocos = list(
+                executor.map(
+                    _simular_bloco,
+                    [catalogos] * len(tamanhos),
+                    tamanhos,
+                    sementes,
+                )
+            )
+
+    return _resumir(_juntar_blocos(blocos))
@@ -0,0 +1,81 @@
+"""
+database/cardapios.py
+-------------------------------------------------------
+Semanas geradas, guardadas por morador.
+
+Cada semana fica numa linha (morador_id, numero) com a
+semana codificada (core/compacta.py), a semente, o
+modo economico e a versao do catalogo que a gerou.
+A linha de maior numero e a semana atual; as
+anteriores ficam como historico.
+-------------------------------------------------------
+"""
+
+from datetime import datetime, timezone
+
+from database.db import conflito_atualizar, get_connection, get_placeholder, inserir_linhas
+
+
+class CardapioSalvo:
+    __slots__ = ("numero", "semente", "economico", "assinatura", "dados")
+
+    def __init__(self, numero, semente, economico, assinatura, dados):
+        self.numero = numero
+        self.semente = semente
+        self.economico = economico
+        self.assinatura = assinatura
+        self.dados = dados
+
+
+def carregar_cardapio_atual(morador_id):
+    conn = get_connection()
+    cursor = conn.cursor()
+    placeholder = get_placeholder()
+    try:
+        cursor.execute(
+            f"""
+            SELECT numero, semente, economico, assinatura, dados
+            FROM cardapios
+            WHERE morador_id = {placeholder}
+            ORDER BY numero DESC
+            LIMIT 1
+            """,
+            (morador_id,),
+        )
+        linha = cursor.fetchone()
+    finally:
+        conn.close()
+
+    if linha is None:
+        return None
+    numero, semente, economico, assinatura, dados = linha
+    return CardapioSalvo(numero, semente, bool(economico), assinatura, bytes(dados))
+
+
+def salvar_cardapio(morador_id, numero, semente, economico, assinatura, dados):
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        inserir_linhas(
+            cursor,
+            "cardapios",
+            ("morador_id", "numero", "semente", "economico", "assinatura", "dados", "atualizado_em"),
+            [
+                (
+                    morador_id,
+                    numero,
+                    semente,
+                    int(economico),
+                    assinatura,
+                    dados,
+                    datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                )
+            ],
+            conflito_atualizar(
+                ("morador_id", "numero"),
+                ("semente", "economico", "assinatura", "dados", "atualizado_em"),
+            ),
+        )
+        conn.commit()
+    finally:
+        conn.close()
@@ -8,134 +8,103 @@ Compativel com SQLite e PostgreSQL.
 
 import hashlib
 import sqlite3
+import threading
+from datetime import datetime, timezone
 from urllib.parse import urlparse
 
-from config import DATABASE_PATH, DATABASE_URL
+from config import (
+    DATABASE_PATH,
+    DATABASE_URL,
+    POOL_TAMANHO_MAXIMO,
+    POOL_TEMPO_LIMITE,
+    POOL_VERIFICAR_APOS,
+)
+from database.migracoes import aplicar_migracoes
+from database.pool import ConexaoEmprestada, PoolConexoes, FontePostgres, FonteSqlite
 
 try:
     import psycopg2
+    from psycopg2.extras import execute_values
 except ImportError:
     psycopg2 = None
+    execute_values = None
 
+# SQLite antigo aceita ate 999 parametros por comando.
+LIMITE_VARIAVEIS_SQLITE = 999
+LOTE_INSERCAO = 1000
+CANAL_ALTERACOES = "eventos_alteracao"
+ERROS_INTEGRIDADE = (sqlite3.IntegrityError,) + ((psycopg2.IntegrityError,) if psycopg2 else ())
 
-def get_connection():
-    if DATABASE_URL:
-        if not psycopg2:
-            raise RuntimeError("psycopg2 nao instalado.")
-
-        result = urlparse(DATABASE_URL)
-        return psycopg2.connect(
-            dbname=result.path[1:],
-            user=result.username,
-            password=result.password,
-            host=result.hostname,
-            port=result.port,
-        )
+_pool = None
+_trava_pool = threading.Lock()
+_migrado = False
+_trava_migracao = threading.Lock()
 
-    return sqlite3.connect(DATABASE_PATH)
 
-
-def is_postgres():
-    return bool(DATABASE_URL)
+def parametros_postgres():
+    result = urlparse(DATABASE_URL)
+    return {
+        "dbname": result.path[1:],
+        "user": result.username,
+        "password": result.password,
+        "host": result.hostname,
+        "port": result.port,
+    }
 
 
-def get_placeholder():
-    return "%s" if is_postgres() else "?"
+def _criar_fonte():
+    if DATABASE_URL:
+        return FontePostgres(parametros_postgres(), POOL_TAMANHO_MAXIMO)
+    return FonteSqlite(DATABASE_PATH)
+
+
+def obter_pool():
+    global _pool
+    if _pool is None:
+        with _trava_pool:
+            if _pool is None:
+                _pool = PoolConexoes(
+                    _criar_fonte(),
+                    POOL_TAMANHO_MAXIMO,
+                    POOL_TEMPO_LIMITE,
+                    POOL_VERIFICAR_APOS,
+                )
+    return _pool
 
 
-def criar_tabelas():
-    conn = get_connection()
-    cursor = conn.cursor()
-    placeholder = get_placeholder()
+def get_connection():
+    # Conexao emprestada do pool; close() devolve em vez de fechar.
+    pool = obter_pool()
+    return ConexaoEmprestada(pool.adquirir(), pool)
 
-    id_type = "SERIAL PRIMARY KEY" if is_postgres() else "INTEGER PRIMARY KEY AUTOINCREMENT"
 
-    cursor.execute(
-        f"""
-        CREATE TABLE IF NOT EXISTS usuarios (
-            id {id_type},
-            username TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            tipo TEXT DEFAULT 'comum'
-        )
-        """
-    )
+def conexao():
+    # with conexao() as conn: commit ao sair, rollback em erro.
+    return obter_pool().conexao()
 
-    cursor.execute(
-        f"""
-        CREATE TABLE IF NOT EXISTS moradores (
-            id {id_type},
-            usuario_id INTEGER NOT NULL,
-            nome TEXT NOT NULL,
-            meta_calorica INTEGER NOT NULL,
-            UNIQUE(usuario_id, nome)
-        )
-        """
-    )
 
-    cursor.execute(
-        f"""
-        CREATE TABLE IF NOT EXISTS alimentos (
-            id {id_type},
-            usuario_id INTEGER NOT NULL,
-            nome TEXT NOT NULL,
-            preco REAL NOT NULL,
-            UNIQUE(usuario_id, nome)
-        )
-        """
-    )
+def is_postgres():
+    return bool(DATABASE_URL)
 
-    cursor.execute(
-        f"""
-        CREATE TABLE IF NOT EXISTS porcoes (
-            id {id_type},
-            morador_id INTEGER NOT NULL,
-            alimento_id INTEGER NOT NULL,
-            gramas INTEGER NOT NULL,
-            UNIQUE(morador_id, alimento_id)
-        )
-        """
-    )
 
-    cursor.execute(
-        f"""
-        CREATE TABLE IF NOT EXISTS preparos_alimento (
-            id {id_type},
-            alimento_id INTEGER NOT NULL,
-            nome TEXT NOT NULL,
-            UNIQUE(alimento_id, nome)
-        )
-        """
-    )
+def get_placeholder():
+    return "%s" if is_postgres() else "?"
 
-    # Regra global: mandioca deve ter apenas preparo "Cozida".
-    cursor.execute(
-        f"""
-        DELETE FROM preparos_alimento
-        WHERE nome = {placeholder}
-          AND alimento_id IN (
-              SELECT id
-              FROM alimentos
-              WHERE nome = {placeholder}
-          )
-        """,
-        ("Frita na Airfryer", "Mandioca"),
-    )
-    cursor.execute(
-        f"""
-        DELETE FROM preparos_alimento
-        WHERE nome IN ({placeholder}, {placeholder})
-          AND alimento_id IN (
-              SELECT id
-              FROM alimentos
-              WHERE nome = {placeholder}
-          )
-        """,
-        ("Frita na Airfrier", "Frita na Ayrfrier", "Mandioca"),
-    )
 
-    conn.commit()
-    conn.close()
+def criar_tabelas():
+    # Migracoes rodam uma vez por processo; reruns do Streamlit nao tocam no schema.
+    global _migrado
+    if _migrado:
+        return
+    with _trava_migracao:
+        if _migrado:
+            return
+        conn = get_connection()
+        try:
+            aplicar_migracoes(conn, is_postgres())
+        finally:
+            conn.close()
+        _migrado = True
 
 
 def hash_senha(senha):
@@ -148,29 +117,27 @@ def criar_usuario(username, password):
     placeholder = get_placeholder()
     senha_hash = hash_senha(password)
 
+    # Usuario e dados iniciais na mesma transacao.
     try:
-        cursor.execute(
-            f"""
-            INSERT INTO usuarios (username, password)
-            VALUES ({placeholder}, {placeholder})
-            """,
-            (username, senha_hash),
-        )
-        conn.commit()
-
-        cursor.execute(
-            f"""
-            SELECT id FROM usuarios
-            WHERE username = {placeholder}
-            """,
-            (username,),
-        )
-        usuario_id = cursor.fetchone()[0]
+        sql = f"INSERT INTO usuarios (username, password) VALUES ({placeholder}, {placeholder})"
+        if is_postgres():
+            cursor.execute(sql + " RETURNING id", (username, senha_hash))
+            usuario_id = cursor.fetchone()[0]
+        else:
+            # RETURNING so existe a partir do SQLite 3.35.
+            cursor.execute(sql, (username, senha_hash))
+            usuario_id = cursor.lastrowid
 
-        onboarding_inicial(usuario_id)
+        onboarding_inicial(usuario_id, conn)
+        conn.commit()
         return True
-    except Exception:
+    except ERROS_INTEGRIDADE:
+        # Nome de usuario ja cadastrado.
+        conn.rollback()
         return False
+    except Exception:
+        conn.rollback()
+        raise
     finally:
         conn.close()
 
@@ -225,82 +192,178 @@ def obter_preparos_padrao():
     }
 
 
-def onboarding_inicial(usuario_id):
+def blocos(valores, fixos=0):
+    # Fatias que cabem num comando junto com `fixos` parametros fixos.
+    valores = list(valores)
+    tamanho = len(valores) if is_postgres() else max(1, LIMITE_VARIAVEIS_SQLITE - fixos)
+    for inicio in range(0, len(valores), tamanho or 1):
+        yield valores[inicio:inicio + tamanho]
+
+
+def conflito_atualizar(chave, colunas):
+    return (
+        f"ON CONFLICT ({', '.join(chave)}) DO UPDATE SET "
+        + ", ".join(f"{coluna} = excluded.{coluna}" for coluna in colunas)
+    )
+
+
+def inserir_linhas(cursor, tabela, colunas, linhas, conflito="ON CONFLICT DO NOTHING"):
+    # Varias linhas por comando; por padrao, linhas que ja existem (UNIQUE) sao ignoradas.
+    if not linhas:
+        return
+    nomes = ", ".join(colunas)
+    if is_postgres():
+        execute_values(
+            cursor,
+            f"INSERT INTO {tabela} ({nomes}) VALUES %s {conflito}",
+            linhas,
+            page_size=LOTE_INSERCAO,
+        )
+        return
+
+    tupla = "(" + ", ".join("?" * len(colunas)) + ")"
+    por_comando = max(1, LIMITE_VARIAVEIS_SQLITE // len(colunas))
+    for inicio in range(0, len(linhas), por_comando):
+        bloco = linhas[inicio:inicio + por_comando]
+        cursor.execute(
+            f"INSERT INTO {tabela} ({nomes}) VALUES {', '.join([tupla] * len(bloco))} {conflito}",
+            [valor for linha in bloco for valor in linha],
+        )
+
+
+def incrementar_versao_catalogo(cursor, usuario_id=None, morador_id=None):
+    # Normalmente via registrar_alteracao, antes do commit da escrita.
+    placeholder = get_placeholder()
+    if usuario_id is None:
+        cursor.execute(
+            f"""
+            UPDATE usuarios
+            SET versao_catalogo = versao_catalogo + 1
+            WHERE id = (SELECT usuario_id FROM moradores WHERE id = {placeholder})
+            """,
+            (morador_id,),
+        )
+        return
+    cursor.execute(
+        f"UPDATE usuarios SET versao_catalogo = versao_catalogo + 1 WHERE id = {placeholder}",
+        (usuario_id,),
+    )
+
+
+def registrar_alteracao(cursor, entidade, entidade_id=None, usuario_id=None, morador_id=None):
+    # Versao + evento na transacao da escrita; sem usuario_id, vale o dono do morador.
+    incrementar_versao_catalogo(cursor, usuario_id, morador_id)
+    placeholder = get_placeholder()
+    criado_em = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    if usuario_id is not None:
+        cursor.execute(
+            f"""
+            INSERT INTO eventos_alteracao (usuario_id, entidade, entidade_id, criado_em)
+            VALUES ({placeholder}, {placeholder}, {placeholder}, {placeholder})
+            """,
+            (usuario_id, entidade, entidade_id, criado_em),
+        )
+    else:
+        cursor.execute(
+            f"""
+            INSERT INTO eventos_alteracao (usuario_id, entidade, entidade_id, criado_em)
+            SELECT usuario_id, {placeholder}, {placeholder}, {placeholder}
+            FROM moradores
+            WHERE id = {placeholder}
+            """,
+            (entidade, entidade_id, criado_em, morador_id),
+        )
+    _notificar_alteracao(cursor)
+
+
+def _notificar_alteracao(cursor):
+    # No PostgreSQL o NOTIFY so e entregue no commit; no SQLite os ouvintes consultam a tabela.
+    if is_postgres():
+        cursor.execute(f"NOTIFY {CANAL_ALTERACOES}")
+
+
+def versao_catalogo(usuario_id):
     conn = get_connection()
     cursor = conn.cursor()
     placeholder = get_placeholder()
+    try:
+        cursor.execute(
+            f"SELECT versao_catalogo FROM usuarios WHERE id = {placeholder}",
+            (usuario_id,),
+        )
+        linha = cursor.fetchone()
+    finally:
+        conn.close()
+    return linha[0] if linha else None
 
-    for nome, meta in obter_moradores_padrao().items():
-        if is_postgres():
-            cursor.execute(
-                f"""
-                INSERT INTO moradores (usuario_id, nome, meta_calorica)
-                VALUES ({placeholder}, {placeholder}, {placeholder})
-                ON CONFLICT DO NOTHING
-                """,
-                (usuario_id, nome, meta),
-            )
-        else:
-            cursor.execute(
-                f"""
-                INSERT OR IGNORE INTO moradores (usuario_id, nome, meta_calorica)
-                VALUES ({placeholder}, {placeholder}, {placeholder})
-                """,
-                (usuario_id, nome, meta),
-            )
 
-    for nome, preco in obter_alimentos_padrao().items():
-        if is_postgres():
-            cursor.execute(
-                f"""
-                INSERT INTO alimentos (usuario_id, nome, preco)
-                VALUES ({placeholder}, {placeholder}, {placeholder})
-                ON CONFLICT DO NOTHING
-                """,
-                (usuario_id, nome, preco),
-            )
-        else:
+def _inserir_preparos_padrao(cursor, usuario_ids):
+    # Preparos ligados aos alimentos pelo nome, sem ler os ids de volta.
+    placeholder = get_placeholder()
+    pares = [(alimento, preparo) for alimento, preparos in obter_preparos_padrao().items() for preparo in preparos]
+    valores = ", ".join([f"({placeholder}, {placeholder})"] * len(pares))
+    parametros = [valor for par in pares for valor in par]
+
+    for bloco in blocos(usuario_ids, len(parametros)):
+        cursor.execute(
+            f"""
+            INSERT INTO preparos_alimento (alimento_id, nome)
+            SELECT a.id, v.column2
+            FROM alimentos a
+            JOIN (VALUES {valores}) AS v ON v.column1 = a.nome
+            WHERE a.usuario_id IN ({", ".join([placeholder] * len(bloco))})
+            ON CONFLICT DO NOTHING
+            """,
+            parametros + list(bloco),
+        )
+
+
+def onboarding_usuarios(usuario_ids, conn=None):
+    # Com conn, roda na transacao de quem chamou (que faz o commit).
+    usuario_ids = list(usuario_ids)
+    propria = conn is None
+    if propria:
+        conn = get_connection()
+
+    try:
+        cursor = conn.cursor()
+        inserir_linhas(
+            cursor,
+            "moradores",
+            ("usuario_id", "nome", "meta_calorica"),
+            [(u, nome, meta) for u in usuario_ids for nome, meta in obter_moradores_padrao().items()],
+        )
+        inserir_linhas(
+            cursor,
+            "alimentos",
+            ("usuario_id", "nome", "preco"),
+            [(u, nome, preco) for u in usuario_ids for nome, preco in obter_alimentos_padrao().items()],
+        )
+        _inserir_preparos_padrao(cursor, usuario_ids)
+        placeholder = get_placeholder()
+        for bloco in blocos(usuario_ids):
             cursor.execute(
                 f"""
-                INSERT OR IGNORE INTO alimentos (usuario_id, nome, preco)
-                VALUES ({placeholder}, {placeholder}, {placeholder})
+                UPDATE usuarios
+                SET versao_catalogo = versao_catalogo + 1
+                WHERE id IN ({", ".join([placeholder] * len(bloco))})
                 """,
-                (usuario_id, nome, preco),
+                bloco,
             )
+        criado_em = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        inserir_linhas(
+            cursor,
+            "eventos_alteracao",
+            ("usuario_id", "entidade", "entidade_id", "criado_em"),
+            [(u, "usuario", u, criado_em) for u in usuario_ids],
+        )
+        _notificar_alteracao(cursor)
+        if propria:
+            conn.commit()
+    finally:
+        if propria:
+            conn.close()
 
-    cursor.execute(
-        f"""
-        SELECT id, nome
-        FROM alimentos
-        WHERE usuario_id = {placeholder}
-        """,
-        (usuario_id,),
-    )
-    alimentos_usuario = cursor.fetchall()
-    alimento_por_nome = {nome: alimento_id for alimento_id, nome in alimentos_usuario}
-
-    for nome_alimento, preparos in obter_preparos_padrao().items():
-        alimento_id = alimento_por_nome.get(nome_alimento)
-        if not alimento_id:
-            continue
-        for preparo in preparos:
-            if is_postgres():
-                cursor.execute(
-                    f"""
-                    INSERT INTO preparos_alimento (alimento_id, nome)
-                    VALUES ({placeholder}, {placeholder})
-                    ON CONFLICT DO NOTHING
-                    """,
-                    (alimento_id, preparo),
-                )
-            else:
-                cursor.execute(
-                    f"""
-                    INSERT OR IGNORE INTO preparos_alimento (alimento_id, nome)
-                    VALUES ({placeholder}, {placeholder})
-                    """,
-                    (alimento_id, preparo),
-                )
 
-    conn.commit()
-    conn.close()
+def onboarding_inicial(usuario_id, conn=None):
+    onboarding_usuarios([usuario_id], conn)
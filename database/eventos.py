@@ -0,0 +1,262 @@
+"""
+database/eventos.py
+-------------------------------------------------------
+Invalidacao de caches entre processos.
+
+As escritas gravam uma linha em eventos_alteracao
+(registrar_alteracao, em database/db.py). Cada processo
+roda um ouvinte que le os eventos novos pelo ultimo id
+visto e chama as funcoes registradas para a entidade
+com (usuario_id, entidade_id).
+
+Ids sao reservados no INSERT, mas as transacoes podem
+terminar fora de ordem: um id menor pode aparecer
+depois de um maior. Por isso os buracos na sequencia
+ficam anotados e sao relidos ate aparecerem ou
+passarem de EVENTOS_ESPERA_LACUNA segundos (rollback).
+
+No SQLite o ouvinte consulta a tabela a cada
+EVENTOS_INTERVALO segundos. No PostgreSQL ele tambem
+escuta o canal do NOTIFY e consulta assim que chega
+uma notificacao; a tabela continua sendo a fonte, entao
+notificacoes perdidas so atrasam a invalidacao. Falhas
+de conexao reiniciam o ciclo com espera crescente.
+
+Eventos mais velhos que EVENTOS_RETENCAO segundos sao
+apagados pelo proprio ouvinte de tempos em tempos.
+-------------------------------------------------------
+"""
+
+import logging
+import select
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from config import EVENTOS_ESPERA_LACUNA, EVENTOS_INTERVALO, EVENTOS_RETENCAO
+from database.db import (
+    CANAL_ALTERACOES,
+    blocos,
+    get_connection,
+    get_placeholder,
+    is_postgres,
+    parametros_postgres,
+)
+
+try:
+    import psycopg2
+except ImportError:
+    psycopg2 = None
+
+LOTE_EVENTOS = 500
+# Buracos maiores que isso na sequencia nao sao acompanhados um a um.
+MAXIMO_LACUNAS = 1000
+ESPERA_MAXIMA_RECONEXAO = 30.0
+PODA_A_CADA = 3600.0
+
+log = logging.getLogger(__name__)
+
+_ouvintes = {}
+_trava_ouvintes = threading.Lock()
+_ouvinte_processo = None
+_trava_processo = threading.Lock()
+
+
+def ao_alterar(entidades, funcao):
+    with _trava_ouvintes:
+        for entidade in entidades:
+            _ouvintes.setdefault(entidade, []).append(funcao)
+
+
+def ultimo_evento():
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT MAX(id) FROM eventos_alteracao")
+        return cursor.fetchone()[0] or 0
+    finally:
+        conn.close()
+
+
+def ler_eventos(apos_id, limite=LOTE_EVENTOS):
+    conn = get_connection()
+    placeholder = get_placeholder()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""
+            SELECT id, usuario_id, entidade, entidade_id
+            FROM eventos_alteracao
+            WHERE id > {placeholder}
+            ORDER BY id
+            LIMIT {placeholder}
+            """,
+            (apos_id, limite),
+        )
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
+
+def ler_eventos_ids(ids):
+    conn = get_connection()
+    placeholder = get_placeholder()
+    eventos = []
+    try:
+        cursor = conn.cursor()
+        for bloco in blocos(sorted(ids)):
+            cursor.execute(
+                f"""
+                SELECT id, usuario_id, entidade, entidade_id
+                FROM eventos_alteracao
+                WHERE id IN ({", ".join([placeholder] * len(bloco))})
+                """,
+                bloco,
+            )
+            eventos.extend(cursor.fetchall())
+    finally:
+        conn.close()
+    return sorted(eventos)
+
+
+def podar_eventos(retencao=EVENTOS_RETENCAO):
+    limite = (datetime.now(timezone.utc) - timedelta(seconds=retencao)).isoformat(timespec="seconds")
+    conn = get_connection()
+    placeholder = get_placeholder()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"DELETE FROM eventos_alteracao WHERE criado_em < {placeholder}", (limite,))
+        apagados = cursor.rowcount
+        conn.commit()
+    finally:
+        conn.close()
+    return apagados
+
+
+class OuvinteAlteracoes:
+    def __init__(self, intervalo=EVENTOS_INTERVALO, desde=None):
+        self.intervalo = intervalo
+        # Sem ponto de partida, so interessa o que acontecer daqui em diante.
+        self.ultimo_id = ultimo_evento() if desde is None else desde
+        self.processados = 0
+        self.falhas = 0
+        # id ainda nao visto -> momento em que o buraco apareceu.
+        self.lacunas = {}
+        self._proxima_poda = time.monotonic() + PODA_A_CADA
+        self._parar = threading.Event()
+        self._thread = None
+
+    def _despachar(self, evento):
+        evento_id, usuario_id, entidade, entidade_id = evento
+        for funcao in _ouvintes.get(entidade, ()):
+            # Um ouvinte com erro nao trava a fila: registra e segue.
+            try:
+                funcao(usuario_id, entidade_id)
+            except Exception:
+                self.falhas += 1
+                log.exception("Ouvinte de %s falhou no evento %s.", entidade, evento_id)
+
+    def _reler_lacunas(self):
+        if not self.lacunas:
+            return 0
+        eventos = ler_eventos_ids(self.lacunas)
+        for evento in eventos:
+            self.lacunas.pop(evento[0], None)
+            self._despachar(evento)
+
+        limite = time.monotonic() - EVENTOS_ESPERA_LACUNA
+        for evento_id, desde in list(self.lacunas.items()):
+            if desde < limite:
+                del self.lacunas[evento_id]
+        return len(eventos)
+
+    def _anotar_lacunas(self, evento_id):
+        inicio = max(self.ultimo_id + 1, evento_id - MAXIMO_LACUNAS)
+        agora = time.monotonic()
+        for faltando in range(inicio, evento_id):
+            self.lacunas.setdefault(faltando, agora)
+
+    def processar_pendentes(self):
+        total = self._reler_lacunas()
+        while True:
+            eventos = ler_eventos(self.ultimo_id)
+            for evento in eventos:
+                self._anotar_lacunas(evento[0])
+                self._despachar(evento)
+                self.ultimo_id = evento[0]
+            total += len(eventos)
+            if len(eventos) < LOTE_EVENTOS:
+                break
+        self.processados += total
+        return total
+
+    def _podar_se_preciso(self):
+        if time.monotonic() < self._proxima_poda:
+            return
+        self._proxima_poda = time.monotonic() + PODA_A_CADA
+        podar_eventos()
+
+    def _ciclo_consulta(self):
+        while not self._parar.wait(self.intervalo):
+            self.processar_pendentes()
+            self._podar_se_preciso()
+
+    def _ciclo_postgres(self):
+        conn = psycopg2.connect(**parametros_postgres())
+        conn.autocommit = True
+        try:
+            conn.cursor().execute(f"LISTEN {CANAL_ALTERACOES}")
+            # O que chegou enquanto nao havia LISTEN.
+            self.processar_pendentes()
+            while not self._parar.is_set():
+                # Acorda com NOTIFY ou, no maximo, a cada intervalo.
+                if select.select([conn], [], [], self.intervalo) != ([], [], []):
+                    conn.poll()
+                    conn.notifies.clear()
+                self.processar_pendentes()
+                self._podar_se_preciso()
+        finally:
+            conn.close()
+
+    def _rodar(self):
+        ciclo = self._ciclo_postgres if is_postgres() and psycopg2 else self._ciclo_consulta
+        espera = self.intervalo
+        while not self._parar.is_set():
+            inicio = time.monotonic()
+            try:
+                ciclo()
+            except Exception:
+                log.exception("Ouvinte de alteracoes perdeu o banco; nova tentativa em %.1fs.", espera)
+            # Espera cresce so enquanto as falhas forem seguidas.
+            if time.monotonic() - inicio > ESPERA_MAXIMA_RECONEXAO:
+                espera = self.intervalo
+            self._parar.wait(espera)
+            espera = min(max(espera, 0.1) * 2, ESPERA_MAXIMA_RECONEXAO)
+
+    def ativo(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def iniciar(self):
+        if self.ativo():
+            return self
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._rodar, name="ouvinte-alteracoes", daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self, tempo_limite=None):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(tempo_limite)
+            self._thread = None
+
+
+def iniciar_ouvinte_alteracoes():
+    # Um ouvinte por processo, como o pool; se a thread morreu, sobe de novo.
+    global _ouvinte_processo
+    with _trava_processo:
+        if _ouvinte_processo is None:
+            _ouvinte_processo = OuvinteAlteracoes()
+        if not _ouvinte_processo.ativo():
+            _ouvinte_processo.iniciar()
+    return _ouvinte_processo
@@ -0,0 +1,251 @@
+"""
+database/migracoes.py
+-------------------------------------------------------
+Migracoes versionadas do schema.
+
+Cada migracao tem um numero, uma descricao e uma
+funcao que recebe o cursor. A tabela schema_version
+guarda as versoes ja aplicadas; cada migracao roda
+numa transacao propria junto com o registro da versao,
+entao um banco ja atualizado nao recebe DDL nenhum.
+
+Os indices seguem as consultas quentes do app; os
+UNIQUE das tabelas ja atendem os filtros por
+usuario_id, morador_id e alimento_id + nome.
+-------------------------------------------------------
+"""
+
+import sqlite3
+from datetime import datetime, timezone
+
+
+class MigracaoFalhou(RuntimeError):
+    pass
+
+
+def _tabelas_iniciais(cursor, postgres):
+    id_type = "SERIAL PRIMARY KEY" if postgres else "INTEGER PRIMARY KEY AUTOINCREMENT"
+
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS usuarios (
+            id {id_type},
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            tipo TEXT DEFAULT 'comum'
+        )
+        """
+    )
+
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS moradores (
+            id {id_type},
+            usuario_id INTEGER NOT NULL,
+            nome TEXT NOT NULL,
+            meta_calorica INTEGER NOT NULL,
+            UNIQUE(usuario_id, nome)
+        )
+        """
+    )
+
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS alimentos (
+            id {id_type},
+            usuario_id INTEGER NOT NULL,
+            nome TEXT NOT NULL,
+            preco REAL NOT NULL,
+            UNIQUE(usuario_id, nome)
+        )
+        """
+    )
+
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS porcoes (
+            id {id_type},
+            morador_id INTEGER NOT NULL,
+            alimento_id INTEGER NOT NULL,
+            gramas INTEGER NOT NULL,
+            UNIQUE(morador_id, alimento_id)
+        )
+        """
+    )
+
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS preparos_alimento (
+            id {id_type},
+            alimento_id INTEGER NOT NULL,
+            nome TEXT NOT NULL,
+            UNIQUE(alimento_id, nome)
+        )
+        """
+    )
+
+    # Lanches por usuario; sem linhas, vale a tabela padrao (core/lanches.py).
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS lanches (
+            id {id_type},
+            usuario_id INTEGER NOT NULL,
+            nome TEXT NOT NULL,
+            gramas INTEGER NOT NULL,
+            tipo TEXT NOT NULL DEFAULT 'simples',
+            peso REAL NOT NULL DEFAULT 1,
+            UNIQUE(usuario_id, nome)
+        )
+        """
+    )
+
+
+def _preparos_mandioca(cursor, postgres):
+    # Regra global: mandioca deve ter apenas preparo "Cozida".
+    placeholder = "%s" if postgres else "?"
+    cursor.execute(
+        f"""
+        DELETE FROM preparos_alimento
+        WHERE nome IN ({placeholder}, {placeholder}, {placeholder})
+          AND alimento_id IN (
+              SELECT id
+              FROM alimentos
+              WHERE nome = {placeholder}
+          )
+        """,
+        ("Frita na Airfryer", "Frita na Airfrier", "Frita na Ayrfrier", "Mandioca"),
+    )
+
+
+def _indices_consultas(cursor, postgres):
+    # Excluir um alimento apaga as porcoes dele (painel de alimentos).
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_porcoes_alimento ON porcoes (alimento_id)")
+    # Porcoes do morador e o LEFT JOIN do catalogo saem so do indice.
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_porcoes_morador_gramas "
+        "ON porcoes (morador_id, alimento_id, gramas)"
+    )
+    # Lanches do usuario na ordem de cadastro (carga do catalogo).
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_lanches_usuario ON lanches (usuario_id, id)")
+
+
+def _tabela_cardapios(cursor, postgres):
+    id_type = "SERIAL PRIMARY KEY" if postgres else "INTEGER PRIMARY KEY AUTOINCREMENT"
+    blob_type = "BYTEA" if postgres else "BLOB"
+    # Uma linha por semana gerada; a de maior numero e a atual.
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS cardapios (
+            id {id_type},
+            morador_id INTEGER NOT NULL,
+            numero INTEGER NOT NULL,
+            semente BIGINT NOT NULL,
+            economico INTEGER NOT NULL DEFAULT 0,
+            assinatura TEXT NOT NULL,
+            dados {blob_type} NOT NULL,
+            atualizado_em TEXT NOT NULL,
+            UNIQUE(morador_id, numero)
+        )
+        """
+    )
+
+
+def _versoes_catalogo(cursor, postgres):
+    # Contadores avancados na mesma transacao de cada escrita no catalogo.
+    cursor.execute("ALTER TABLE usuarios ADD COLUMN versao_catalogo INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("ALTER TABLE moradores ADD COLUMN versao_porcoes INTEGER NOT NULL DEFAULT 0")
+
+
+def _eventos_alteracao(cursor, postgres):
+    id_type = "BIGSERIAL PRIMARY KEY" if postgres else "INTEGER PRIMARY KEY AUTOINCREMENT"
+    # Quem le acompanha pelo ultimo id visto; o ouvinte apaga os antigos.
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS eventos_alteracao (
+            id {id_type},
+            usuario_id INTEGER NOT NULL,
+            entidade TEXT NOT NULL,
+            entidade_id INTEGER,
+            criado_em TEXT NOT NULL
+        )
+        """
+    )
+
+
+def _indice_eventos_criado_em(cursor, postgres):
+    # A poda do ouvinte apaga pelo horario do evento.
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_eventos_criado_em ON eventos_alteracao (criado_em)")
+
+
+def _remover_versao_porcoes(cursor, postgres):
+    # Contador por morador sem leitor; a versao do usuario ja cobre as porcoes.
+    if postgres:
+        cursor.execute("ALTER TABLE moradores DROP COLUMN IF EXISTS versao_porcoes")
+        return
+    cursor.execute("PRAGMA table_info(moradores)")
+    colunas = {linha[1] for linha in cursor.fetchall()}
+    # DROP COLUMN so existe a partir do SQLite 3.35; antes, a coluna (com DEFAULT) fica.
+    if "versao_porcoes" in colunas and sqlite3.sqlite_version_info >= (3, 35):
+        cursor.execute("ALTER TABLE moradores DROP COLUMN versao_porcoes")
+
+
+MIGRACOES = (
+    (1, "tabelas iniciais", _tabelas_iniciais),
+    (2, "mandioca apenas cozida", _preparos_mandioca),
+    (3, "indices das consultas do app", _indices_consultas),
+    (4, "semanas geradas por morador", _tabela_cardapios),
+    (5, "versao do catalogo por usuario e das porcoes por morador", _versoes_catalogo),
+    (6, "registro de alteracoes para invalidar caches", _eventos_alteracao),
+    (7, "indice para poda de eventos_alteracao", _indice_eventos_criado_em),
+    (8, "remove versao_porcoes dos moradores", _remover_versao_porcoes),
+)
+
+
+def _criar_tabela_versoes(conn):
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            versao INTEGER PRIMARY KEY,
+            descricao TEXT NOT NULL,
+            aplicada_em TEXT NOT NULL
+        )
+        """
+    )
+    conn.commit()
+
+
+def versoes_aplicadas(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT versao FROM schema_version")
+    return {linha[0] for linha in cursor.fetchall()}
+
+
+def aplicar_migracoes(conn, postgres, migracoes=MIGRACOES):
+    _criar_tabela_versoes(conn)
+    aplicadas = versoes_aplicadas(conn)
+    placeholder = "%s" if postgres else "?"
+
+    novas = []
+    for versao, descricao, aplicar in migracoes:
+        if versao in aplicadas:
+            continue
+        cursor = conn.cursor()
+        try:
+            aplicar(cursor, postgres)
+            cursor.execute(
+                f"""
+                INSERT INTO schema_version (versao, descricao, aplicada_em)
+                VALUES ({placeholder}, {placeholder}, {placeholder})
+                """,
+                (versao, descricao, datetime.now(timezone.utc).isoformat(timespec="seconds")),
+            )
+            conn.commit()
+        except Exception as erro:
+            conn.rollback()
+            # Outro processo pode ter aplicado a mesma versao ao mesmo tempo.
+            if versao in versoes_aplicadas(conn):
+                continue
+            raise MigracaoFalhou(f"Migracao {versao} ({descricao}) falhou: {erro}") from erro
+        novas.append(versao)
+    return novas
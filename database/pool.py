@@ -0,0 +1,241 @@
+"""
+database/pool.py
+-------------------------------------------------------
+Pool de conexoes do processo.
+
+PostgreSQL e SQLite guardam conexoes abertas numa lista
+de ociosas para reuso (no SQLite com
+check_same_thread=False), uma por vez em cada thread.
+
+Um semaforo limita as conexoes emprestadas ao mesmo
+tempo (tamanho maximo); quem passa do tempo limite de
+espera recebe PoolEsgotado. Conexoes paradas ha algum
+tempo sao testadas com SELECT 1 antes de voltar ao uso.
+-------------------------------------------------------
+"""
+
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import psycopg2
+except ImportError:
+    psycopg2 = None
+
+
+class PoolEsgotado(RuntimeError):
+    pass
+
+
+class FonteSqlite:
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.ociosas = []
+        self.trava = threading.Lock()
+
+    def obter(self):
+        with self.trava:
+            if self.ociosas:
+                return self.ociosas.pop()
+        return sqlite3.connect(self.caminho, check_same_thread=False)
+
+    def devolver(self, conn):
+        with self.trava:
+            self.ociosas.append(conn)
+
+    def descartar(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def fechar(self):
+        with self.trava:
+            ociosas, self.ociosas = self.ociosas, []
+        for conn in ociosas:
+            self.descartar(conn)
+
+    def quebrada(self, conn):
+        return False
+
+
+class FontePostgres:
+    # Lista propria de conexoes ociosas: o ThreadedConnectionPool com
+    # minconn=0 fecharia cada conexao devolvida. O limite de conexoes
+    # abertas ao mesmo tempo fica com o semaforo do PoolConexoes.
+    def __init__(self, parametros, tamanho_maximo):
+        if not psycopg2:
+            raise RuntimeError("psycopg2 nao instalado.")
+        self.parametros = parametros
+        self.tamanho_maximo = tamanho_maximo
+        self.ociosas = []
+        self.trava = threading.Lock()
+
+    def obter(self):
+        with self.trava:
+            if self.ociosas:
+                return self.ociosas.pop()
+        return psycopg2.connect(**self.parametros)
+
+    def devolver(self, conn):
+        with self.trava:
+            if len(self.ociosas) < self.tamanho_maximo:
+                self.ociosas.append(conn)
+                return
+        self.descartar(conn)
+
+    def descartar(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def fechar(self):
+        with self.trava:
+            ociosas, self.ociosas = self.ociosas, []
+        for conn in ociosas:
+            self.descartar(conn)
+
+    def quebrada(self, conn):
+        return bool(conn.closed)
+
+
+class PoolConexoes:
+    def __init__(self, fonte, tamanho_maximo, tempo_limite, verificar_apos):
+        self.fonte = fonte
+        self.tamanho_maximo = tamanho_maximo
+        self.tempo_limite = tempo_limite
+        self.verificar_apos = verificar_apos
+
+        self._vagas = threading.BoundedSemaphore(tamanho_maximo)
+        self._trava = threading.Lock()
+        self._ultimo_uso = {}
+        self._em_uso = 0
+        self._aquisicoes = 0
+        self._esperas = 0
+        self._espera_total = 0.0
+        self._espera_maxima = 0.0
+        self._esgotamentos = 0
+        self._descartadas = 0
+
+    def _saudavel(self, conn):
+        if self.fonte.quebrada(conn):
+            return False
+        ultimo = self._ultimo_uso.get(id(conn))
+        if ultimo is None or time.monotonic() - ultimo < self.verificar_apos:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _descartar(self, conn):
+        self._ultimo_uso.pop(id(conn), None)
+        self.fonte.descartar(conn)
+        with self._trava:
+            self._descartadas += 1
+
+    def adquirir(self):
+        inicio = time.monotonic()
+        if not self._vagas.acquire(timeout=self.tempo_limite):
+            with self._trava:
+                self._esgotamentos += 1
+            raise PoolEsgotado(
+                f"Nenhuma conexao livre em {self.tempo_limite}s "
+                f"(maximo de {self.tamanho_maximo} conexoes)."
+            )
+        espera = time.monotonic() - inicio
+
+        try:
+            conn = self.fonte.obter()
+            # Uma nova tentativa apenas: se a conexao nova tambem falhar, o erro sobe.
+            if not self._saudavel(conn):
+                self._descartar(conn)
+                conn = self.fonte.obter()
+        except Exception:
+            self._vagas.release()
+            raise
+
+        with self._trava:
+            self._em_uso += 1
+            self._aquisicoes += 1
+            self._espera_total += espera
+            self._espera_maxima = max(self._espera_maxima, espera)
+            if espera > 0.001:
+                self._esperas += 1
+        return conn
+
+    def liberar(self, conn):
+        try:
+            # Nada de transacao aberta volta para o pool.
+            conn.rollback()
+            self._ultimo_uso[id(conn)] = time.monotonic()
+            self.fonte.devolver(conn)
+        except Exception:
+            self._descartar(conn)
+        finally:
+            with self._trava:
+                self._em_uso -= 1
+            self._vagas.release()
+
+    @contextmanager
+    def conexao(self):
+        conn = self.adquirir()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.liberar(conn)
+
+    def metricas(self):
+        with self._trava:
+            return {
+                "tamanho_maximo": self.tamanho_maximo,
+                "em_uso": self._em_uso,
+                "aquisicoes": self._aquisicoes,
+                "esperas": self._esperas,
+                "espera_media_ms": 1000 * self._espera_total / self._aquisicoes if self._aquisicoes else 0.0,
+                "espera_maxima_ms": 1000 * self._espera_maxima,
+                "esgotamentos": self._esgotamentos,
+                "descartadas": self._descartadas,
+            }
+
+    def fechar(self):
+        self.fonte.fechar()
+        self._ultimo_uso.clear()
+
+
+class ConexaoEmprestada:
+    # Mesma interface da conexao do driver; close() devolve ao pool.
+    __slots__ = ("_conn", "_pool")
+
+    def __init__(self, conn, pool):
+        self._conn = conn
+        self._pool = pool
+
+    def __getattr__(self, nome):
+        conn = object.__getattribute__(self, "_conn")
+        if conn is None:
+            raise RuntimeError("Conexao ja devolvida ao pool.")
+        return getattr(conn, nome)
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.liberar(conn)
+
+    def __del__(self):
+        # Rede de seguranca para caminhos de erro que nao chegam ao close().
+        try:
+            self.close()
+        except Exception:
+            pass
@@ -0,0 +1,241 @@
+"""
+database/repositorio.py
+-------------------------------------------------------
+Leitura do cadastro completo de um usuario.
+
+Uma unica consulta traz alimentos (com preparos),
+lanches e moradores (com porcoes). Os filhos vem
+agregados em JSON na propria linha: json_agg e
+json_object_agg no PostgreSQL, json_group_array e
+json_group_object (JSON1) no SQLite.
+
+O resultado sai em registros compactos; o formato em
+dicionarios que o catalogo consome e montado por
+morador sob demanda.
+
+obter_catalogo_usuario guarda o resultado por usuario
+no processo (leitura direta do cache). As escritas do
+painel chamam invalidar_catalogo_usuario, que descarta
+a entrada e avanca a geracao do usuario: uma leitura
+que comecou antes da escrita nao volta para o cache.
+Escritas de outros processos chegam pelo ouvinte de
+eventos_alteracao (database/eventos.py); o contador
+usuarios.versao_catalogo, conferido no maximo a cada
+CATALOGO_VERIFICAR_APOS segundos, cobre o intervalo.
+-------------------------------------------------------
+"""
+
+import json
+import threading
+import time
+
+from config import CATALOGO_VERIFICAR_APOS
+from core.cache import CacheLRU
+from core.catalogo import compilar_catalogo
+from database.db import get_connection, get_placeholder, is_postgres, versao_catalogo
+from database.eventos import ao_alterar
+
+ENTIDADES_CATALOGO = ("usuario", "alimento", "preparo", "morador", "porcoes")
+
+_cache_usuarios = CacheLRU(tamanho_maximo=256)
+_geracoes = {}
+_trava_geracoes = threading.Lock()
+
+
+class Alimento:
+    __slots__ = ("id", "nome", "preco", "preparos", "preparo_ids")
+
+    def __init__(self, alimento_id, nome, preco, preparos, preparo_ids):
+        self.id = alimento_id
+        self.nome = nome
+        self.preco = preco
+        self.preparos = preparos
+        self.preparo_ids = preparo_ids
+
+
+class Morador:
+    __slots__ = ("id", "nome", "meta_calorica")
+
+    def __init__(self, morador_id, nome, meta_calorica):
+        self.id = morador_id
+        self.nome = nome
+        self.meta_calorica = meta_calorica
+
+
+class CatalogoUsuario:
+    __slots__ = ("alimentos", "moradores", "porcoes", "lanches", "versao", "verificado_em", "_catalogos")
+
+    def __init__(self, alimentos, moradores, porcoes, lanches, versao=None):
+        self.alimentos = alimentos
+        self.moradores = moradores
+        # morador_id -> {alimento_id: gramas}; 0 = restricao.
+        self.porcoes = porcoes
+        self.lanches = lanches
+        # usuarios.versao_catalogo lido na mesma consulta dos dados.
+        self.versao = versao
+        self.verificado_em = time.monotonic()
+        self._catalogos = {}
+
+    def porcoes_morador(self, morador_id):
+        return self.porcoes.get(morador_id, {})
+
+    def alimentos_morador(self, morador_id):
+        porcoes = self.porcoes_morador(morador_id)
+        return [
+            {
+                "id": a.id,
+                "nome": a.nome,
+                "preco": a.preco,
+                "preparos": list(a.preparos),
+                "gramas": porcoes.get(a.id),
+            }
+            for a in self.alimentos
+        ]
+
+    def catalogo_morador(self, morador_id):
+        # Compilado uma vez por carga; o objeto todo e descartado quando algo muda.
+        catalogo = self._catalogos.get(morador_id)
+        if catalogo is None:
+            catalogo = compilar_catalogo(self.alimentos_morador(morador_id), lanches=self.lanches)
+            self._catalogos[morador_id] = catalogo
+        return catalogo
+
+
+_SQL_SQLITE = """
+    SELECT 'a', a.id, a.nome, a.preco, NULL,
+           (SELECT json_group_array(json_array(pa.id, pa.nome))
+            FROM (
+                SELECT id, nome
+                FROM preparos_alimento
+                WHERE alimento_id = a.id
+                ORDER BY nome
+            ) pa)
+    FROM alimentos a
+    WHERE a.usuario_id = {p}
+    UNION ALL
+    SELECT 'l', l.id, l.nome, l.gramas, NULL, json_array(l.tipo, l.peso)
+    FROM lanches l
+    WHERE l.usuario_id = {p}
+    UNION ALL
+    SELECT 'm', m.id, m.nome, m.meta_calorica, NULL,
+           (SELECT json_group_object(po.alimento_id, po.gramas)
+            FROM porcoes po
+            WHERE po.morador_id = m.id)
+    FROM moradores m
+    WHERE m.usuario_id = {p}
+    UNION ALL
+    SELECT 'u', u.id, NULL, NULL, u.versao_catalogo, NULL
+    FROM usuarios u
+    WHERE u.id = {p}
+    ORDER BY 1, 3
+"""
+
+# No PostgreSQL os NULLs levam tipo explicito: o UNION resolve os tipos par a par.
+_SQL_POSTGRES = """
+    SELECT 'a', a.id, a.nome, a.preco, NULL::integer,
+           (SELECT json_agg(json_build_array(pa.id, pa.nome) ORDER BY pa.nome)
+            FROM preparos_alimento pa
+            WHERE pa.alimento_id = a.id)
+    FROM alimentos a
+    WHERE a.usuario_id = {p}
+    UNION ALL
+    SELECT 'l', l.id, l.nome, l.gramas, NULL::integer, json_build_array(l.tipo, l.peso)
+    FROM lanches l
+    WHERE l.usuario_id = {p}
+    UNION ALL
+    SELECT 'm', m.id, m.nome, m.meta_calorica, NULL::integer,
+           (SELECT json_object_agg(po.alimento_id, po.gramas)
+            FROM porcoes po
+            WHERE po.morador_id = m.id)
+    FROM moradores m
+    WHERE m.usuario_id = {p}
+    UNION ALL
+    SELECT 'u', u.id, NULL::text, NULL::real, u.versao_catalogo, NULL::json
+    FROM usuarios u
+    WHERE u.id = {p}
+    ORDER BY 1, 3
+"""
+
+
+def _json(valor, vazio):
+    # psycopg2 ja devolve o JSON decodificado; o SQLite devolve texto.
+    if valor is None:
+        return vazio
+    return json.loads(valor) if isinstance(valor, str) else valor
+
+
+def carregar_catalogo_usuario(usuario_id):
+    sql = (_SQL_POSTGRES if is_postgres() else _SQL_SQLITE).format(p=get_placeholder())
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, (usuario_id,) * 4)
+        linhas = cursor.fetchall()
+    finally:
+        conn.close()
+
+    alimentos = []
+    lanches = []
+    moradores = []
+    porcoes = {}
+    versao = None
+    for tipo, registro_id, nome, valor, contador, filhos in linhas:
+        if tipo == "a":
+            preparos = _json(filhos, [])
+            alimentos.append(
+                Alimento(
+                    registro_id,
+                    nome,
+                    valor,
+                    tuple(p[1] for p in preparos),
+                    tuple(p[0] for p in preparos),
+                )
+            )
+        elif tipo == "l":
+            tipo_lanche, peso = _json(filhos, [])
+            lanches.append((registro_id, (nome, int(valor), tipo_lanche, peso)))
+        elif tipo == "m":
+            moradores.append(Morador(registro_id, nome, int(valor)))
+            porcoes[registro_id] = {int(k): g for k, g in _json(filhos, {}).items()}
+        else:
+            versao = contador
+
+    # Alimentos e moradores por nome; lanches na ordem de cadastro (pesa no sorteio).
+    lanches.sort()
+    return CatalogoUsuario(tuple(alimentos), tuple(moradores), porcoes, tuple(l for _, l in lanches), versao)
+
+
+def _ainda_valido(usuario_id, dados):
+    agora = time.monotonic()
+    if agora - dados.verificado_em < CATALOGO_VERIFICAR_APOS:
+        return True
+    if versao_catalogo(usuario_id) != dados.versao:
+        return False
+    dados.verificado_em = agora
+    return True
+
+
+def obter_catalogo_usuario(usuario_id):
+    dados = _cache_usuarios.obter(usuario_id)
+    if dados is not None and _ainda_valido(usuario_id, dados):
+        return dados
+
+    geracao = _geracoes.get(usuario_id, 0)
+    dados = carregar_catalogo_usuario(usuario_id)
+    with _trava_geracoes:
+        if _geracoes.get(usuario_id, 0) == geracao:
+            _cache_usuarios.guardar(usuario_id, dados)
+    return dados
+
+
+def invalidar_catalogo_usuario(usuario_id):
+    with _trava_geracoes:
+        _geracoes[usuario_id] = _geracoes.get(usuario_id, 0) + 1
+        _cache_usuarios.remover(usuario_id)
+
+
+def _catalogo_alterado(usuario_id, entidade_id):
+    invalidar_catalogo_usuario(usuario_id)
+
+
+ao_alterar(ENTIDADES_CATALOGO, _catalogo_alterado)
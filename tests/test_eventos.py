@@ -0,0 +1,126 @@
+"""
+tests/test_eventos.py
+-------------------------------------------------------
+Invalidacao entre processos pelo ouvinte de
+eventos_alteracao, num SQLite temporario.
+-------------------------------------------------------
+"""
+
+import os
+import subprocess
+import sys
+import textwrap
+import time
+
+import pytest
+
+import database.db as db
+from database import eventos, repositorio
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def banco(tmp_path, monkeypatch):
+    caminho = str(tmp_path / "alimentos.db")
+    monkeypatch.setattr(db, "DATABASE_PATH", caminho)
+    monkeypatch.setattr(db, "_pool", None)
+    monkeypatch.setattr(db, "_migrado", False)
+    db.criar_tabelas()
+    yield caminho
+    db.obter_pool().fechar()
+
+
+def _usuario(nome):
+    db.criar_usuario(nome, "1234")
+    return db.autenticar_usuario(nome, "1234")[0]
+
+
+def _esperar(condicao, tempo_limite=10.0):
+    fim = time.monotonic() + tempo_limite
+    while time.monotonic() < fim:
+        if condicao():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_porcoes_salvas_em_outro_processo_invalidam_so_o_usuario(banco):
+    ana = _usuario("ana")
+    bia = _usuario("bia")
+    repositorio.obter_catalogo_usuario(ana)
+    repositorio.obter_catalogo_usuario(bia)
+    morador = repositorio.obter_catalogo_usuario(ana).moradores[0]
+    alimento = repositorio.obter_catalogo_usuario(ana).alimentos[0]
+
+    ouvinte = eventos.OuvinteAlteracoes(intervalo=0.1).iniciar()
+    try:
+        script = textwrap.dedent(
+            f"""
+            import database.db as db
+            db.DATABASE_PATH = {banco!r}
+            from ui.painel_alimentos import salvar_porcoes_morador
+            assert salvar_porcoes_morador({morador.id}, {{{alimento.id}: 321}})
+            """
+        )
+        subprocess.run([sys.executable, "-c", script], cwd=RAIZ, check=True)
+
+        # processados so avanca depois dos ouvintes: espera o contador, nao o cache.
+        assert _esperar(lambda: ouvinte.processados == 1)
+        assert ana not in repositorio._cache_usuarios
+        assert bia in repositorio._cache_usuarios
+    finally:
+        ouvinte.parar(5)
+
+
+def test_ouvinte_com_erro_nao_trava_os_eventos_seguintes(banco, monkeypatch):
+    ana = _usuario("ana")
+    ouvinte = eventos.OuvinteAlteracoes()
+    vistos = []
+
+    def falha(usuario_id, entidade_id):
+        raise RuntimeError("falha no ouvinte")
+
+    monkeypatch.setitem(eventos._ouvintes, "teste", [falha, lambda u, e: vistos.append(e)])
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    db.registrar_alteracao(cursor, "teste", 1, usuario_id=ana)
+    db.registrar_alteracao(cursor, "teste", 2, usuario_id=ana)
+    conn.commit()
+    conn.close()
+
+    assert ouvinte.processar_pendentes() == 2
+    assert vistos == [1, 2]
+    assert ouvinte.falhas == 2
+    assert ouvinte.processar_pendentes() == 0
+
+
+def test_id_que_aparece_depois_de_um_maior_nao_se_perde(banco, monkeypatch):
+    ana = _usuario("ana")
+    ouvinte = eventos.OuvinteAlteracoes()
+    vistos = []
+    monkeypatch.setitem(eventos._ouvintes, "teste", [lambda u, e: vistos.append(e)])
+
+    # Simula a transacao do id menor terminando depois da do maior.
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    agora = "2026-01-01T00:00:00+00:00"
+    inserir = "INSERT INTO eventos_alteracao (id, usuario_id, entidade, entidade_id, criado_em) VALUES (?, ?, ?, ?, ?)"
+    cursor.execute(inserir, (ouvinte.ultimo_id + 2, ana, "teste", 2, agora))
+    conn.commit()
+    ouvinte.processar_pendentes()
+    cursor.execute(inserir, (ouvinte.ultimo_id - 1, ana, "teste", 1, agora))
+    conn.commit()
+    conn.close()
+
+    ouvinte.processar_pendentes()
+    assert vistos == [2, 1]
+    assert not ouvinte.lacunas
+
+
+def test_podar_eventos_apaga_os_antigos(banco):
+    _usuario("ana")
+    assert eventos.ultimo_evento() > 0
+    assert eventos.podar_eventos(retencao=3600) == 0
+    assert eventos.podar_eventos(retencao=-60) > 0
+    assert eventos.ultimo_evento() == 0
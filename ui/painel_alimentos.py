@@ -8,157 +8,94 @@ Painel administrativo:
 """
 
 import streamlit as st
-from database.db import get_connection, get_placeholder
-
-
-def listar_alimentos(usuario_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    placeholder = get_placeholder()
-    cursor.execute(
-        f"""
-        SELECT id, nome, preco
-        FROM alimentos
-        WHERE usuario_id = {placeholder}
-        """,
-        (usuario_id,),
-    )
-    dados = cursor.fetchall()
-    conn.close()
-    return dados
-
-
-def listar_moradores(usuario_id):
-    conn = get_connection()
-    cursor = conn.cursor()
+from database.db import (
+    blocos,
+    conflito_atualizar,
+    get_connection,
+    get_placeholder,
+    inserir_linhas,
+    registrar_alteracao,
+)
+from database.repositorio import invalidar_catalogo_usuario, obter_catalogo_usuario
+
+
+def _apagar_porcoes(cursor, morador_id, alimento_ids, apenas_restricoes=False):
     placeholder = get_placeholder()
-    cursor.execute(
-        f"""
-        SELECT id, nome, meta_calorica
-        FROM moradores
-        WHERE usuario_id = {placeholder}
-        """,
-        (usuario_id,),
-    )
-    dados = cursor.fetchall()
-    conn.close()
-    return dados
-
-
-def listar_preparos_alimento(alimento_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    placeholder = get_placeholder()
-    cursor.execute(
-        f"""
-        SELECT id, nome
-        FROM preparos_alimento
-        WHERE alimento_id = {placeholder}
-        ORDER BY nome
-        """,
-        (alimento_id,),
-    )
-    dados = cursor.fetchall()
-    conn.close()
-    return dados
-
-
-def listar_porcoes_morador(morador_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    placeholder = get_placeholder()
-    cursor.execute(
-        f"""
-        SELECT alimento_id, gramas
-        FROM porcoes
-        WHERE morador_id = {placeholder}
-        """,
-        (morador_id,),
-    )
-    dados = cursor.fetchall()
-    conn.close()
-    return {alimento_id: gramas for alimento_id, gramas in dados}
+    filtro = f" AND gramas = {placeholder}" if apenas_restricoes else ""
+    extras = [0] if apenas_restricoes else []
+    for bloco in blocos(alimento_ids, 1 + len(extras)):
+        cursor.execute(
+            f"""
+            DELETE FROM porcoes
+            WHERE morador_id = {placeholder}
+              AND alimento_id IN ({", ".join([placeholder] * len(bloco))}){filtro}
+            """,
+            [morador_id, *bloco, *extras],
+        )
 
 
 def salvar_porcoes_morador(morador_id, porcoes):
+    # Uma sincronizacao por morador: upsert das porcoes > 0, DELETE das demais.
+    positivas = [(morador_id, alimento_id, int(g)) for alimento_id, g in porcoes.items() if int(g) > 0]
+    zeradas = [alimento_id for alimento_id, g in porcoes.items() if int(g) <= 0]
+
     conn = get_connection()
     cursor = conn.cursor()
-    placeholder = get_placeholder()
     try:
-        for alimento_id, gramas in porcoes.items():
-            cursor.execute(
-                f"""
-                DELETE FROM porcoes
-                WHERE morador_id = {placeholder}
-                  AND alimento_id = {placeholder}
-                """,
-                (morador_id, alimento_id),
-            )
-            if int(gramas) > 0:
-                cursor.execute(
-                    f"""
-                    INSERT INTO porcoes (morador_id, alimento_id, gramas)
-                    VALUES ({placeholder}, {placeholder}, {placeholder})
-                    """,
-                    (morador_id, alimento_id, int(gramas)),
-                )
+        inserir_linhas(
+            cursor,
+            "porcoes",
+            ("morador_id", "alimento_id", "gramas"),
+            positivas,
+            conflito_atualizar(("morador_id", "alimento_id"), ("gramas",)),
+        )
+        _apagar_porcoes(cursor, morador_id, zeradas)
+        registrar_alteracao(cursor, "porcoes", morador_id, morador_id=morador_id)
         conn.commit()
         return True
     except Exception:
+        conn.rollback()
         return False
     finally:
         conn.close()
 
 
 def salvar_restricoes_morador(morador_id, alimento_ids_restritos, todos_alimento_ids):
+    restritos = set(alimento_ids_restritos)
+    liberados = [alimento_id for alimento_id in todos_alimento_ids if alimento_id not in restritos]
+
     conn = get_connection()
     cursor = conn.cursor()
-    placeholder = get_placeholder()
-    restritos = set(alimento_ids_restritos)
     try:
-        for alimento_id in todos_alimento_ids:
-            if alimento_id in restritos:
-                # Restricao vence qualquer configuracao de porcao.
-                cursor.execute(
-                    f"""
-                    DELETE FROM porcoes
-                    WHERE morador_id = {placeholder}
-                      AND alimento_id = {placeholder}
-                    """,
-                    (morador_id, alimento_id),
-                )
-                cursor.execute(
-                    f"""
-                    INSERT INTO porcoes (morador_id, alimento_id, gramas)
-                    VALUES ({placeholder}, {placeholder}, {placeholder})
-                    """,
-                    (morador_id, alimento_id, 0),
-                )
-            else:
-                # Ao remover restricao, apaga apenas marcacoes de 0g.
-                cursor.execute(
-                    f"""
-                    DELETE FROM porcoes
-                    WHERE morador_id = {placeholder}
-                      AND alimento_id = {placeholder}
-                      AND gramas = {placeholder}
-                    """,
-                    (morador_id, alimento_id, 0),
-                )
+        # Restricao vence qualquer configuracao de porcao.
+        inserir_linhas(
+            cursor,
+            "porcoes",
+            ("morador_id", "alimento_id", "gramas"),
+            [(morador_id, alimento_id, 0) for alimento_id in restritos],
+            conflito_atualizar(("morador_id", "alimento_id"), ("gramas",)),
+        )
+        # Ao remover restricao, apaga apenas marcacoes de 0g.
+        _apagar_porcoes(cursor, morador_id, liberados, apenas_restricoes=True)
+        registrar_alteracao(cursor, "porcoes", morador_id, morador_id=morador_id)
         conn.commit()
         return True
     except Exception:
+        conn.rollback()
         return False
     finally:
         conn.close()
 
 
-def painel_alimentos(usuario_id):
+def painel_alimentos(usuario_id, dados=None):
+    if dados is None:
+        dados = obter_catalogo_usuario(usuario_id)
+
     st.subheader("Painel Administrativo")
     st.markdown("---")
 
     st.subheader("Alimentos")
-    alimentos = listar_alimentos(usuario_id)
+    alimentos = dados.alimentos
 
     with st.expander("Adicionar alimento"):
         nome_alimento_novo = st.text_input("Nome do novo alimento", key="add_al_nome")
@@ -185,7 +122,9 @@ def painel_alimentos(usuario_id):
                         """,
                         (usuario_id, nome_limpo, float(preco_alimento_novo)),
                     )
+                    registrar_alteracao(cursor, "alimento", usuario_id=usuario_id)
                     conn.commit()
+                    invalidar_catalogo_usuario(usuario_id)
                     st.success("Alimento adicionado.")
                     st.rerun()
                 except Exception:
@@ -193,7 +132,8 @@ def painel_alimentos(usuario_id):
                 finally:
                     conn.close()
 
-    for alimento_id, nome, preco in alimentos:
+    for alimento in alimentos:
+        alimento_id, nome, preco = alimento.id, alimento.nome, alimento.preco
         with st.expander(nome):
             novo_nome = st.text_input("Nome", value=nome, key=f"nome_{alimento_id}")
             novo_preco = st.number_input(
@@ -216,7 +156,9 @@ def painel_alimentos(usuario_id):
                     """,
                     (novo_nome.strip(), float(novo_preco), alimento_id),
                 )
+                registrar_alteracao(cursor, "alimento", alimento_id, usuario_id)
                 conn.commit()
+                invalidar_catalogo_usuario(usuario_id)
                 conn.close()
                 st.success("Alimento atualizado.")
                 st.rerun()
@@ -234,7 +176,9 @@ def painel_alimentos(usuario_id):
                         f"DELETE FROM alimentos WHERE id = {placeholder}",
                         (alimento_id,),
                     )
+                    registrar_alteracao(cursor, "alimento", alimento_id, usuario_id)
                     conn.commit()
+                    invalidar_catalogo_usuario(usuario_id)
                     st.success("Alimento removido.")
                     st.rerun()
                 except Exception:
@@ -243,8 +187,7 @@ def painel_alimentos(usuario_id):
                     conn.close()
 
             st.markdown("**Modos de preparo**")
-            preparos = listar_preparos_alimento(alimento_id)
-            for preparo_id, preparo_nome in preparos:
+            for preparo_id, preparo_nome in zip(alimento.preparo_ids, alimento.preparos):
                 c1, c2 = st.columns([5, 1])
                 with c1:
                     st.text(preparo_nome)
@@ -257,7 +200,9 @@ def painel_alimentos(usuario_id):
                             f"DELETE FROM preparos_alimento WHERE id = {placeholder}",
                             (preparo_id,),
                         )
+                        registrar_alteracao(cursor, "preparo", preparo_id, usuario_id)
                         conn.commit()
+                        invalidar_catalogo_usuario(usuario_id)
                         conn.close()
                         st.rerun()
 
@@ -278,7 +223,9 @@ def painel_alimentos(usuario_id):
                             """,
                             (alimento_id, preparo_limpo),
                         )
+                        registrar_alteracao(cursor, "preparo", usuario_id=usuario_id)
                         conn.commit()
+                        invalidar_catalogo_usuario(usuario_id)
                         st.success("Preparo adicionado.")
                         st.rerun()
                     except Exception:
@@ -288,7 +235,7 @@ def painel_alimentos(usuario_id):
 
     st.divider()
     st.subheader("Moradores")
-    moradores = listar_moradores(usuario_id)
+    moradores = dados.moradores
 
     with st.expander("Adicionar morador"):
         nome_novo = st.text_input("Nome do novo morador", key="add_morador_nome")
@@ -315,7 +262,9 @@ def painel_alimentos(usuario_id):
                         """,
                         (usuario_id, nome_limpo, int(meta_nova)),
                     )
+                    registrar_alteracao(cursor, "morador", usuario_id=usuario_id)
                     conn.commit()
+                    invalidar_catalogo_usuario(usuario_id)
                     st.success("Morador adicionado.")
                     st.rerun()
                 except Exception:
@@ -323,7 +272,8 @@ def painel_alimentos(usuario_id):
                 finally:
                     conn.close()
 
-    for morador_id, nome, meta in moradores:
+    for morador in moradores:
+        morador_id, nome, meta = morador.id, morador.nome, morador.meta_calorica
         with st.expander(nome):
             novo_nome = st.text_input("Nome", value=nome, key=f"mor_nome_{morador_id}")
             nova_meta = st.number_input(
@@ -346,7 +296,9 @@ def painel_alimentos(usuario_id):
                     """,
                     (novo_nome.strip(), int(nova_meta), morador_id),
                 )
+                registrar_alteracao(cursor, "morador", morador_id, usuario_id)
                 conn.commit()
+                invalidar_catalogo_usuario(usuario_id)
                 conn.close()
                 st.success("Morador atualizado.")
                 st.rerun()
@@ -365,11 +317,17 @@ def painel_alimentos(usuario_id):
                         f"DELETE FROM porcoes WHERE morador_id = {placeholder}",
                         (morador_id,),
                     )
+                    cursor.execute(
+                        f"DELETE FROM cardapios WHERE morador_id = {placeholder}",
+                        (morador_id,),
+                    )
                     cursor.execute(
                         f"DELETE FROM moradores WHERE id = {placeholder}",
                         (morador_id,),
                     )
+                    registrar_alteracao(cursor, "morador", morador_id, usuario_id)
                     conn.commit()
+                    invalidar_catalogo_usuario(usuario_id)
                     st.success("Morador removido.")
                     st.rerun()
                 except Exception:
@@ -386,12 +344,12 @@ def painel_alimentos(usuario_id):
         st.info("Cadastre pelo menos um morador.")
         return
 
-    opcoes_morador = {f"{nome} (id {morador_id})": morador_id for morador_id, nome, _ in moradores}
+    opcoes_morador = {f"{m.nome} (id {m.id})": m.id for m in moradores}
     morador_label = st.selectbox("Morador para configurar porcoes", list(opcoes_morador.keys()))
     morador_id_porcoes = opcoes_morador[morador_label]
 
-    porcoes_atuais = listar_porcoes_morador(morador_id_porcoes)
-    alimentos_por_nome = {nome: alimento_id for alimento_id, nome, _preco in alimentos}
+    porcoes_atuais = dados.porcoes_morador(morador_id_porcoes)
+    alimentos_por_nome = {a.nome: a.id for a in alimentos}
     restritos_atuais_nomes = [
         nome for nome, alimento_id in alimentos_por_nome.items()
         if int(porcoes_atuais.get(alimento_id, -1)) == 0
@@ -407,6 +365,7 @@ def painel_alimentos(usuario_id):
 
     if st.button("Salvar restricoes", key=f"salvar_restricoes_{morador_id_porcoes}"):
         if salvar_restricoes_morador(morador_id_porcoes, restritos_ids, list(alimentos_por_nome.values())):
+            invalidar_catalogo_usuario(usuario_id)
             st.success("Restricoes atualizadas.")
             st.rerun()
         else:
@@ -414,11 +373,12 @@ def painel_alimentos(usuario_id):
 
     valores_porcoes = {}
 
-    for alimento_id, nome, _preco in alimentos:
+    for alimento in alimentos:
+        alimento_id = alimento.id
         chave = f"porcao_{morador_id_porcoes}_{alimento_id}"
         valor_padrao = int(porcoes_atuais.get(alimento_id, 0))
         valores_porcoes[alimento_id] = st.number_input(
-            f"{nome} (g por refeicao)",
+            f"{alimento.nome} (g por refeicao)",
             min_value=0,
             value=valor_padrao,
             step=10,
@@ -428,6 +388,7 @@ def painel_alimentos(usuario_id):
 
     if st.button("Salvar porcoes", key=f"salvar_porcoes_{morador_id_porcoes}"):
         if salvar_porcoes_morador(morador_id_porcoes, valores_porcoes):
+            invalidar_catalogo_usuario(usuario_id)
             st.success("Porcoes atualizadas.")
             st.rerun()
         else:
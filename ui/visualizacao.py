@@ -8,7 +8,8 @@ Exibicao de cardapio e listas de compra.
 import pandas as pd
 import streamlit as st
 
-from core.compras import calcular_lista_compras
+from core.compras import calcular_lista_compras, calcular_lista_familia
+from core.lanches import tabela_lanches
 from export.image_export import gerar_jpg_lista
 from export.pdf_export import gerar_pdf_lista
 
@@ -22,17 +23,7 @@ def _obter_gramas(item):
     nome = item.get("nome", "")
     if not nome:
         return 0
-    if "Banana + Aveia" in nome:
-        return 220
-    if "Presunto" in nome and "Mussarela" in nome:
-        return 180
-    if "Pasta de Amendoim" in nome:
-        return 230
-    if "Vitamina de Banana + Aveia" in nome:
-        return 300
-    if nome.startswith("Rap10"):
-        return 140 if nome.count("+") >= 2 else 100
-    return 0
+    return tabela_lanches().gramas_de(nome, padrao=0)
 
 
 def _refeicao_texto(ref):
@@ -99,8 +90,9 @@ def mostrar_cardapio(semana, morador_nome, meta):
     return df
 
 
-def mostrar_lista_individual(semana, morador_nome):
-    lista_df, custo_total = calcular_lista_compras(semana)
+def mostrar_lista_individual(semana, morador_nome, lista=None):
+    # lista: ListaCompras mantida junto da semana (evita recalcular).
+    lista_df, custo_total = lista.calcular() if lista is not None else calcular_lista_compras(semana)
 
     col_titulo, col_menu = st.columns([8, 1])
     with col_titulo:
@@ -122,24 +114,11 @@ def mostrar_lista_individual(semana, morador_nome):
 
 
 def mostrar_lista_familia(lista_semanas):
-    listas = []
-    custo_total = 0
-
-    for semana in lista_semanas:
-        if not semana:
-            continue
-        lista_df, custo = calcular_lista_compras(semana)
-        listas.append(lista_df)
-        custo_total += custo
-
-    if not listas:
+    if not any(lista_semanas):
         st.warning("Nenhuma lista disponivel.")
         return
 
-    lista_total = pd.concat(listas)
-    lista_total = lista_total.groupby(["Alimento", "Unidade"], as_index=False).agg(
-        {"Quantidade": "sum", "Custo estimado (R$)": "sum"}
-    )
+    lista_total, custo_total = calcular_lista_familia(lista_semanas)
 
     col_titulo, col_menu = st.columns([8, 1])
     with col_titulo: